@@ -0,0 +1,130 @@
+"""Load test against the in-memory backend: per-rerun latency, document reads/writes and peak memory.
+
+Seeds N employees with years of history, then drives the real streamlit_app.py headlessly with
+Streamlit's AppTest (log in, load an employee, change period, save, switch to the supervisor
+view, rerun). AppTest cannot edit a data_editor, so a one-cell save is then timed directly:
+once through save_period_changes() and once through the app's SaveQueue, from submit() until
+its outcome is reported (which includes the COALESCE_SECONDS wait). Run from any directory:
+    python benchmarks/bench_app.py --employees 5 50 200 --years 3
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['TTA_BACKEND'] = 'memory'
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from data_store import get_record_cache, period_doc_id, record_key, save_period_changes
+from memory_backend import seed, shared_client
+from pay_periods import period_start
+from write_queue import get_save_queue
+
+# AppTest resolves relative paths against the calling file, so give it an absolute one
+APP = os.path.join(ROOT, 'streamlit_app.py')
+PASSWORD = 'benchmark'
+NAMED_USERS = ["Stacey", "Aaron", "Daisy", "Cindy", "Alan"]
+
+
+def step(results, client, name, action):
+    """Runs one script rerun (or save) and records its latency, reads, writes and peak traced memory."""
+    client.reset_counters()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    at = action()
+    elapsed = time.perf_counter() - start
+    if getattr(at, 'exception', None):
+        raise RuntimeError(f"{name}: {at.exception[0].message}")
+    results.append((name, elapsed, client.reads, client.writes, tracemalloc.get_traced_memory()[1]))
+    return at
+
+
+def one_cell(user, start, hours):
+    """Changes (see diff_period) setting `hours` of Regular time on the first day of the period."""
+    date = start.strftime('%Y-%m-%d')
+    return {record_key(date, 'Regular'): {
+        'User': user,
+        'Date': date,
+        'TimeType': 'Regular',
+        'Hours': hours,
+        'LastUpdated': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'EnteredPayment': '',
+    }}
+
+
+def queued_save(save_queue, user, start, changes, base_version):
+    """Submits a save to the SaveQueue and waits for its outcome, as a session's page would."""
+    save_queue.submit('benchmark', user, start, changes, base_version)
+    while not (outcomes := save_queue.results('benchmark')):
+        time.sleep(0.01)
+    doc_id, status, detail = outcomes[0]
+    if status != 'saved':
+        raise RuntimeError(f"queued save of {doc_id}: {status} ({detail})")
+
+
+def run_scenario(employees, years):
+    client = shared_client()
+    client.collections.clear()
+    users = NAMED_USERS + [f"Employee {i}" for i in range(max(employees - len(NAMED_USERS), 0))]
+    seed(client, users[:employees], years, supervisor="Alan")
+    # Fresh process-wide caches, as on a cold start
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.secrets['password'] = PASSWORD
+    results = []
+    tracemalloc.start()
+    try:
+        at = step(results, client, "login page", at.run)
+        at.text_input(key="password").input(PASSWORD)
+        at = step(results, client, "cold load (Stacey)", at.run)
+        at = step(results, client, "warm rerun", at.run)
+        # Select by the raw option label; select_index() goes through the "Week of ..." format_func
+        week_selector = at.selectbox(key="week_selector")
+        editor_rerun = lambda: week_selector.set_value(week_selector.options[0].removeprefix("Week of ")).run()
+        at = step(results, client, "change period", editor_rerun)
+        save = lambda: at.button[0].click().run()
+        at = step(results, client, "save (no changes)", save)
+        at = step(results, client, "supervisor view", lambda: at.selectbox(key="user_select").select("Alan").run())
+        at = step(results, client, "supervisor rerun", at.run)
+
+        # The app's own cache and queue, as the page above used them
+        record_cache = get_record_cache(client)
+        save_queue = get_save_queue(client, record_cache)
+        user, start = NAMED_USERS[0], period_start(pd.Timestamp.now().normalize())
+        doc_id = period_doc_id(user, start)
+        record_cache.ensure_period([user], start)
+        step(results, client, "save 1 cell (direct)", lambda: save_period_changes(
+            client, user, start, one_cell(user, start, 7.5), record_cache.version(doc_id)
+        ))
+        record_cache.invalidate(doc_id)
+        step(results, client, "save 1 cell (queued)", lambda: queued_save(
+            save_queue, user, start, one_cell(user, start, 6.5), record_cache.version(doc_id)
+        ))
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, nargs='+', default=[5, 50, 200])
+    parser.add_argument('--years', type=float, default=3)
+    args = parser.parse_args()
+
+    for employees in args.employees:
+        print(f"\n{employees} employees, {args.years:g} years of history")
+        print(f"{'step':<22} {'latency (ms)':>12} {'reads':>7} {'writes':>7} {'peak MiB':>9}")
+        for name, elapsed, reads, writes, peak in run_scenario(employees, args.years):
+            print(f"{name:<22} {elapsed * 1000:>12.1f} {reads:>7} {writes:>7} {peak / 2**20:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Compares the old per-row date normalization with normalize_dates.
+
+Run from the repository root:
+    python benchmarks/bench_dates.py --records 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_store import normalize_dates
+
+
+def synthetic_dates(n, with_offsets=False, seed=0):
+    """Roughly what years of history look like: mostly YYYY-MM-DD plus a few legacy layouts."""
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 365 * 10, n), unit='D')
+    dates = pd.Series(days.strftime('%Y-%m-%d'))
+    legacy = rng.random(n)
+    dates[legacy < 0.05] = days[legacy < 0.05].strftime('%m/%d/%Y')
+    dates[(legacy >= 0.05) & (legacy < 0.07)] = days[(legacy >= 0.05) & (legacy < 0.07)].strftime('%Y-%m-%d %H:%M:%S')
+    if with_offsets:
+        dates[(legacy >= 0.07) & (legacy < 0.08)] = days[(legacy >= 0.07) & (legacy < 0.08)].strftime('%Y-%m-%dT%H:%M:%S+00:00')
+    return dates
+
+
+def old_path(dates):
+    return pd.to_datetime(dates, format='mixed').apply(
+        lambda x: x.tz_convert('US/Eastern') if x.tz else x.tz_localize('US/Eastern')
+    )
+
+
+def timed(func, dates):
+    start = time.perf_counter()
+    result = func(dates)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=1_000_000)
+    parser.add_argument('--skip-old', action='store_true', help="Only time the vectorized path")
+    parser.add_argument('--with-offsets', action='store_true', help="Include dates stored with a UTC offset")
+    args = parser.parse_args()
+
+    dates = synthetic_dates(args.records, with_offsets=args.with_offsets)
+    print(f"{len(dates):,} synthetic records")
+
+    new, new_time = timed(normalize_dates, dates)
+    print(f"normalize_dates: {new_time:.2f}s")
+
+    if not args.skip_old:
+        try:
+            old, old_time = timed(old_path, dates)
+        except (ValueError, TypeError) as e:
+            # format='mixed' without utc=True rejects naive and offset dates in one column
+            print(f"old path failed: {e}")
+            return
+        print(f"old path:        {old_time:.2f}s ({old_time / new_time:.1f}x slower)")
+        print(f"results match:   {bool((old.reset_index(drop=True) == new.reset_index(drop=True)).all())}")
+
+
+if __name__ == '__main__':
+    main()
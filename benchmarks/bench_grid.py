@@ -0,0 +1,86 @@
+"""Grid build time vs. number of employees: old per-user pivot/merge vs. period_grid.
+
+Only the DataFrame work is timed (no Streamlit rendering). Run from the repository root:
+    python benchmarks/bench_grid.py --employees 5 20 50 200 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_store import TIME_TYPES, period_grid
+
+WEEK_START = pd.Timestamp('2024-12-11')
+
+
+def synthetic_period(employees, seed=0):
+    """One pay period of records: each employee works ~10 of 14 days, with the odd sick/vacation day."""
+    rng = np.random.default_rng(seed)
+    users = [f"Employee {i}" for i in range(employees)]
+    days = pd.date_range(WEEK_START, periods=14, freq='D', tz='US/Eastern')
+    rows = []
+    for user in users:
+        for day in days[rng.random(14) < 0.7]:
+            rows.append({'User': user, 'Date': day, 'TimeType': rng.choice(TIME_TYPES, p=[0.85, 0.05, 0.05, 0.05]),
+                         'Hours': float(rng.choice([4, 6, 8]))})
+    return users, pd.DataFrame(rows)
+
+
+def old_pipeline(records, users):
+    week_end = WEEK_START + pd.Timedelta(days=13)
+    out = {}
+    for user in users:
+        user_df = records[records['User'] == user]
+        date_df = pd.DataFrame({'Date': pd.date_range(start=WEEK_START, end=week_end, freq='D')})
+        date_df['Date'] = date_df['Date'].dt.tz_localize('US/Eastern')
+        pivoted_df = user_df.pivot_table(index='Date', columns='TimeType', values='Hours', aggfunc='sum', fill_value=0)
+        pivoted_df = pd.merge(date_df, pivoted_df, left_on='Date', right_index=True, how='left').fillna(0)
+        for col in TIME_TYPES:
+            if col not in pivoted_df.columns:
+                pivoted_df[col] = 0
+        display_df = pivoted_df.reset_index()
+        display_df['Date'] = display_df['Date'].dt.strftime('%a %m/%d')
+        out[user] = display_df.head(14)
+    return out
+
+
+def new_pipeline(records, users):
+    days, grid = period_grid(records, users, WEEK_START)
+    labels = days.strftime('%a %m/%d')
+    out = {}
+    for user in users:
+        display_df = grid.loc[user].reset_index(drop=True)
+        display_df.insert(0, 'Date', labels)
+        out[user] = display_df
+    return out
+
+
+def best_of(func, *args, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, nargs='+', default=[5, 20, 50, 200, 1000])
+    args = parser.parse_args()
+
+    print(f"{'employees':>10} {'old (ms)':>10} {'new (ms)':>10} {'speedup':>8}")
+    for employees in args.employees:
+        users, records = synthetic_period(employees)
+        old_time = best_of(old_pipeline, records, users)
+        new_time = best_of(new_pipeline, records, users)
+        print(f"{employees:>10} {old_time * 1000:>10.1f} {new_time * 1000:>10.1f} {old_time / new_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,879 @@
+import os
+import threading
+import time
+import tomllib
+from datetime import datetime, timezone
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+from google.api_core.exceptions import GoogleAPIError
+from google.api_core.retry import Retry
+from google.auth.exceptions import TransportError
+import pandas as pd
+import streamlit as st
+
+from instrumentation import count_reads, count_writes, doc_size, timed
+from memory_backend import shared_client
+from pay_periods import PERIOD_DAYS, period_start
+from snapshot_cache import CLOCK_MARGIN, SNAPSHOT_INTERVAL, snapshot_store
+
+# One document per user per pay period, e.g. periods/Stacey_2024-12-11:
+#   {'User': 'Stacey', 'PeriodStart': '2024-12-11',
+#    'Version': 3,  # bumped on every save, used for optimistic concurrency
+#    'UpdatedAt': datetime,  # set on every write, for fetching only what changed since a snapshot
+#    'records': {'2024-12-11_Regular': {'User', 'Date', 'TimeType', 'Hours', 'LastUpdated', 'EnteredPayment'}}}
+PERIODS_COLLECTION = 'periods'
+# Original layout: one document per user holding a `records` array of their whole history
+LEGACY_COLLECTION = 'sheet'
+# Hours per TimeType, maintained by every save:
+#   totals/Stacey_2024-12-11: {'User', 'PeriodStart', 'Hours': {'Regular': 80.0, ...}}
+#   totals/Stacey_2025:       {'User', 'Year', 'Hours': {...}}  (year to date)
+TOTALS_COLLECTION = 'totals'
+# Append-only edit history, one document per user per month of period start; each save adds one entry:
+#   audit/Stacey_2024-12: {'User', 'Month': '2024-12', 'entries': {'2024-12-11_000004': {
+#       'PeriodStart', 'Version', 'At', 'Changes': {'2024-12-11_Regular': [8.0, 7.5], ...}}}}  # [before, after]
+AUDIT_COLLECTION = 'audit'
+
+RECORD_COLUMNS = ['User', 'Date', 'TimeType', 'Hours', 'LastUpdated', 'EnteredPayment', 'id']
+TIME_TYPES = ['Regular', 'Sick', 'Vacation', 'Holiday']
+
+# Firestore rejects batches with more than 500 writes
+BATCH_LIMIT = 500
+
+# How often (seconds) to look for documents changed by other sessions/processes
+CHANGE_CHECK_INTERVAL = 60
+
+# What the Firestore client raises (after its own retries) when the service cannot be reached
+OFFLINE_ERRORS = (GoogleAPIError, TransportError)
+# Cache reads give up after this many seconds instead of the client's default two-minute retry deadline
+PROBE_TIMEOUT = 10
+PROBE_RETRY = Retry(initial=0.25, maximum=2.0, timeout=PROBE_TIMEOUT)
+# After a failed read, the same document or period is not tried again for this many seconds
+OFFLINE_RETRY_INTERVAL = 30
+
+
+# Date layouts written by this app over time, parsed with a fixed format each
+NAIVE_DATE_FORMATS = [
+    (r'^\d{4}-\d{2}-\d{2}$', '%Y-%m-%d'),
+    (r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$', '%Y-%m-%d %H:%M:%S'),
+    (r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}$', '%Y-%m-%dT%H:%M:%S'),
+    (r'^\d{1,2}/\d{1,2}/\d{4}$', '%m/%d/%Y'),
+]
+UTC_OFFSET_PATTERN = r'\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?\s*(?:Z|[+-]\d{2}:?\d{2})$'
+# LastUpdated/EnteredPayment are written as US/Eastern wall-clock strings in this layout
+STAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+@st.cache_resource
+def get_db():
+    """The app's database client: Firestore, or the in-memory stand-in when TTA_BACKEND=memory."""
+    if os.environ.get('TTA_BACKEND') == 'memory':
+        return shared_client()
+    if not firebase_admin._apps:
+        cred = credentials.Certificate({
+            "type": st.secrets["firebase"]["type"],
+            "project_id": st.secrets["firebase"]["project_id"],
+            "private_key_id": st.secrets["firebase"]["private_key_id"],
+            "private_key": st.secrets["firebase"]["private_key"],
+            "client_email": st.secrets["firebase"]["client_email"],
+            "client_id": st.secrets["firebase"]["client_id"],
+            "auth_uri": st.secrets["firebase"]["auth_uri"],
+            "token_uri": st.secrets["firebase"]["token_uri"],
+            "auth_provider_x509_cert_url": st.secrets["firebase"]["auth_provider_x509_cert_url"],
+            "client_x509_cert_url": st.secrets["firebase"]["client_x509_cert_url"]
+        })
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+
+def connect(secrets_path='.streamlit/secrets.toml'):
+    """Firestore client for command-line tools, from the [firebase] table of a Streamlit secrets file."""
+    with open(secrets_path, 'rb') as f:
+        secrets = tomllib.load(f)
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(dict(secrets['firebase'])))
+    return firestore.client()
+
+
+def run_transaction(db, func):
+    """Runs func(transaction) in a Firestore transaction, or the backend's own equivalent."""
+    if hasattr(db, 'run_transaction'):
+        return db.run_transaction(func)
+    return firestore.transactional(func)(db.transaction())
+
+
+def normalize_dates(values, tz='US/Eastern'):
+    """Parses a Series of stored dates into tz-aware timestamps without per-row Python calls.
+
+    Naive values are localized to `tz`, values carrying a UTC offset are converted to it.
+    """
+    values = pd.Series(values)
+    text = values.astype(str).str.strip()
+    pending = pd.Series(True, index=text.index)
+    parts = []
+
+    for pattern, fmt in NAIVE_DATE_FORMATS:
+        mask = pending & text.str.match(pattern)
+        if mask.any():
+            parsed = pd.to_datetime(text[mask], format=fmt, errors='coerce')
+            parts.append(parsed.dt.tz_localize(tz, ambiguous='NaT', nonexistent='shift_forward'))
+            pending &= ~mask
+
+    if pending.any():
+        # Whatever is left falls back to mixed parsing, still localized/converted in bulk
+        has_offset = pending & text.str.contains(UTC_OFFSET_PATTERN)
+        if has_offset.any():
+            parsed = pd.to_datetime(text[has_offset], format='mixed', utc=True, errors='coerce')
+            parts.append(parsed.dt.tz_convert(tz))
+        naive = pending & ~has_offset
+        if naive.any():
+            parsed = pd.to_datetime(text[naive], format='mixed', errors='coerce')
+            parts.append(parsed.dt.tz_localize(tz, ambiguous='NaT', nonexistent='shift_forward'))
+
+    if not parts:
+        return pd.Series(pd.NaT, index=values.index, dtype=f'datetime64[ns, {tz}]')
+    return pd.concat(parts).reindex(values.index)
+
+
+def parse_stamps(values):
+    """Parses LastUpdated/EnteredPayment strings into naive datetimes; '' and missing become NaT."""
+    text = pd.Series(values, dtype=object).fillna('').astype(str).str.strip()
+    parsed = pd.to_datetime(text.where(text != ''), format=STAMP_FORMAT, errors='coerce')
+    # Anything in an older layout is parsed on its own, there are few of those
+    other = parsed.isna() & (text != '')
+    if other.any():
+        parsed[other] = pd.to_datetime(text[other], format='mixed', errors='coerce')
+    return parsed
+
+
+def compact_records(df):
+    """Casts record columns to compact types: categorical User/TimeType/id, float32 Hours, datetime stamps."""
+    for col in ['User', 'TimeType', 'id']:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    if 'Hours' in df.columns:
+        df['Hours'] = pd.to_numeric(df['Hours'], errors='coerce').fillna(0).astype('float32')
+    for col in ['LastUpdated', 'EnteredPayment']:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = parse_stamps(df[col])
+    return df
+
+
+def empty_records():
+    """An empty record DataFrame with the same column types as a loaded one."""
+    return compact_records(pd.DataFrame(columns=RECORD_COLUMNS))
+
+
+def period_doc_id(user, start):
+    """Document id of `user`'s pay period containing `start`."""
+    return f"{user}_{period_start(start).strftime('%Y-%m-%d')}"
+
+
+def year_totals_id(user, year):
+    """Document id of `user`'s year-to-date totals."""
+    return f"{user}_{year}"
+
+
+def user_totals_id(user):
+    """Document id of `user`'s all-time totals, which also carry their latest LastUpdated."""
+    return f"{user}_all"
+
+
+def audit_doc_id(user, start):
+    """Document id of the edit history holding `user`'s pay period containing `start`."""
+    return f"{user}_{period_start(start).strftime('%Y-%m')}"
+
+
+def record_key(date, time_type):
+    """Key of a record inside a period document's `records` map."""
+    return f"{date}_{time_type}"
+
+
+def hours_deltas(old_records, changes):
+    """Per-TimeType hour changes a save makes, for the period and for each calendar year touched."""
+    period = {}
+    years = {}
+    for key, record in changes.items():
+        old = old_records.get(key) or {}
+        delta = (float(record['Hours']) if record is not None else 0.0) - float(old.get('Hours', 0) or 0)
+        if delta == 0:
+            continue
+        date, time_type = key.split('_', 1)
+        period[time_type] = period.get(time_type, 0) + delta
+        year = years.setdefault(int(date[:4]), {})
+        year[time_type] = year.get(time_type, 0) + delta
+    return period, years
+
+
+def audit_entry(old_records, changes, start, version, timestamp):
+    """History entry for one save: only the changed cells, as [hours before, hours after]."""
+    return {
+        'PeriodStart': start.strftime('%Y-%m-%d'),
+        'Version': version,
+        'At': timestamp,
+        'Changes': {
+            key: [
+                float((old_records.get(key) or {}).get('Hours', 0) or 0),
+                float(record['Hours']) if record is not None else 0.0,
+            ]
+            for key, record in changes.items()
+        },
+    }
+
+
+def _increment_totals(writer, db, user, start, period_deltas, year_deltas, last_updated=None):
+    # `writer` is a transaction or batch, so totals commit together with the records
+    if period_deltas or last_updated:
+        user_totals = {'User': user}
+        # An empty map in a merge replaces the stored one, so Hours is only sent when it changes
+        if period_deltas:
+            user_totals['Hours'] = {time_type: firestore.Increment(delta) for time_type, delta in period_deltas.items()}
+        if last_updated:
+            user_totals['LastUpdated'] = last_updated
+        writer.set(db.collection(TOTALS_COLLECTION).document(user_totals_id(user)), user_totals, merge=True)
+    if period_deltas:
+        writer.set(db.collection(TOTALS_COLLECTION).document(period_doc_id(user, start)), {
+            'User': user,
+            'PeriodStart': start.strftime('%Y-%m-%d'),
+            'Hours': {time_type: firestore.Increment(delta) for time_type, delta in period_deltas.items()},
+        }, merge=True)
+    for year, deltas in year_deltas.items():
+        writer.set(db.collection(TOTALS_COLLECTION).document(year_totals_id(user, year)), {
+            'User': user,
+            'Year': year,
+            'Hours': {time_type: firestore.Increment(delta) for time_type, delta in deltas.items()},
+        }, merge=True)
+
+
+@st.cache_data(ttl=CHANGE_CHECK_INTERVAL)
+def load_totals(_db, doc_ids):
+    """Each totals document in `doc_ids` (a tuple), fetched in one round trip.
+
+    Documents that do not exist are left out. Call load_totals.clear() after a save.
+    """
+    refs = [_db.collection(TOTALS_COLLECTION).document(doc_id) for doc_id in doc_ids]
+    with timed('load totals'):
+        totals = {}
+        for snapshot in _db.get_all(refs, retry=PROBE_RETRY, timeout=PROBE_TIMEOUT):
+            if snapshot.exists:
+                totals[snapshot.id] = snapshot.to_dict() or {}
+        count_reads(len(refs), doc_size(totals))
+    return totals
+
+
+class SaveConflict(Exception):
+    """Raised when a period document changed after the editor loaded it."""
+
+    def __init__(self, doc_id, version):
+        super().__init__(f"{doc_id} is at version {version}")
+        self.doc_id = doc_id
+        self.version = version
+
+
+def diff_period(user, display_df, edited_df, full_dates, timestamp):
+    """Compares the rendered grid with the edited one.
+
+    Returns {record key: record} for inserted/updated cells and {record key: None} for cleared ones.
+    `full_dates` maps the displayed 'Wed 12/11' labels to 'YYYY-MM-DD'.
+    """
+    before = display_df.set_index('Date')[TIME_TYPES].astype(float).fillna(0)
+    after = edited_df.set_index('Date')[TIME_TYPES].astype(float).fillna(0)
+    changed = (before != after).stack()
+
+    changes = {}
+    for label, time_type in changed[changed].index:
+        date = full_dates[label]
+        hours = after.at[label, time_type]
+        if hours > 0:
+            changes[record_key(date, time_type)] = {
+                'User': user,
+                'Date': date,
+                'TimeType': time_type,
+                'Hours': float(hours),
+                'LastUpdated': timestamp,
+                'EnteredPayment': ''  # Default to empty string for false
+            }
+        else:
+            changes[record_key(date, time_type)] = None
+    return changes
+
+
+def save_period_changes(db, user, start, changes, base_version):
+    """Applies `changes` (see diff_period) to one period document in a single transaction.
+
+    The period, year-to-date and all-time totals are updated, and an entry appended to the
+    edit history, in the same transaction.
+    Raises SaveConflict if the document's Version is no longer `base_version`.
+    Returns the document id written.
+    """
+    start = period_start(start)
+    doc_id = period_doc_id(user, start)
+    ref = db.collection(PERIODS_COLLECTION).document(doc_id)
+
+    def apply(transaction):
+        snapshot = ref.get(transaction=transaction)
+        doc_data = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        count_reads(1, doc_size(doc_data))
+        current = doc_data.get('Version', 0)
+        if current != base_version:
+            raise SaveConflict(doc_id, current)
+        period_deltas, year_deltas = hours_deltas(doc_data.get('records', {}), changes)
+        last_updated = max((record['LastUpdated'] for record in changes.values() if record), default=None)
+        _increment_totals(transaction, db, user, start, period_deltas, year_deltas, last_updated)
+        entry = audit_entry(
+            doc_data.get('records', {}), changes, start, base_version + 1,
+            last_updated or pd.Timestamp.now(tz='US/Eastern').strftime(STAMP_FORMAT)
+        )
+        transaction.set(db.collection(AUDIT_COLLECTION).document(audit_doc_id(user, start)), {
+            'User': user,
+            'Month': start.strftime('%Y-%m'),
+            'entries': {f"{entry['PeriodStart']}_{entry['Version']:06d}": entry},
+        }, merge=True)
+        transaction.set(ref, {
+            'User': user,
+            'PeriodStart': start.strftime('%Y-%m-%d'),
+            'Version': base_version + 1,
+            'UpdatedAt': datetime.now(timezone.utc),
+            'records': {
+                key: record if record is not None else firestore.DELETE_FIELD
+                for key, record in changes.items()
+            },
+        }, merge=True)
+        count_writes(2 + bool(period_deltas) + len(year_deltas) + bool(period_deltas or last_updated), doc_size(changes))
+
+    with timed('save'):
+        run_transaction(db, apply)
+    return doc_id
+
+
+def load_period_history(db, user, start):
+    """Edit history entries of `user`'s pay period containing `start`, oldest first."""
+    start = period_start(start)
+    with timed('load history'):
+        snapshot = db.collection(AUDIT_COLLECTION).document(audit_doc_id(user, start)).get()
+        doc_data = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        count_reads(1, doc_size(doc_data))
+    period = start.strftime('%Y-%m-%d')
+    entries = [entry for entry in doc_data.get('entries', {}).values() if entry.get('PeriodStart') == period]
+    return sorted(entries, key=lambda entry: entry['Version'])
+
+
+def history_frame(entries):
+    """One row per changed cell of each entry: Version, At, Date, TimeType, Before, After."""
+    rows = [
+        {'Version': entry['Version'], 'At': entry['At'], 'Date': key.split('_', 1)[0],
+         'TimeType': key.split('_', 1)[1], 'Before': before, 'After': after}
+        for entry in entries
+        for key, (before, after) in sorted(entry['Changes'].items())
+    ]
+    return pd.DataFrame(rows, columns=['Version', 'At', 'Date', 'TimeType', 'Before', 'After'])
+
+
+def replay_period(period_records, entries, version):
+    """The period's hours as they were right after save `version`, by undoing later entries.
+
+    `period_records` are the user's current records for the period (rows from the cache).
+    Returns a DataFrame with a Date column and one column per TimeType, for days with hours.
+    """
+    hours = {
+        record_key(date, time_type): float(value)
+        for date, time_type, value in zip(
+            period_records['Date'].dt.strftime('%Y-%m-%d'), period_records['TimeType'], period_records['Hours']
+        )
+    }
+    # Walking back from the current state stays correct even if history started after the document
+    for entry in sorted(entries, key=lambda entry: entry['Version'], reverse=True):
+        if entry['Version'] <= version:
+            break
+        for key, (before, _) in entry['Changes'].items():
+            hours[key] = before
+    cells = pd.Series({tuple(key.split('_', 1)): value for key, value in hours.items() if value}, dtype=float)
+    if cells.empty:
+        return pd.DataFrame(columns=['Date'] + TIME_TYPES)
+    cells.index.names = ['Date', 'TimeType']
+    grid = cells.unstack('TimeType').reindex(columns=TIME_TYPES).fillna(0)
+    return grid.sort_index().reset_index()
+
+
+def set_payment_status(db, period_records, entered_payment):
+    """Sets EnteredPayment on every record in `period_records` (rows from the cache) in a transaction.
+
+    Pass a timestamp string to mark them entered for payment, or '' to reset them. The documents
+    are read inside the transaction, so records cleared since the cache loaded are left out
+    rather than written back as stubs. Returns the ids of the documents written.
+    """
+    with timed('payment'):
+        keys = {
+            doc_id: [
+                record_key(date, time_type)
+                for date, time_type in zip(doc_records['Date'].dt.strftime('%Y-%m-%d'), doc_records['TimeType'])
+            ]
+            for doc_id, doc_records in period_records.groupby('id', observed=True)
+        }
+        doc_ids = sorted(keys)
+        written = []
+        # Firestore caps a transaction at 500 writes; one period has one document per employee
+        for first in range(0, len(doc_ids), BATCH_LIMIT):
+            chunk = {doc_id: keys[doc_id] for doc_id in doc_ids[first:first + BATCH_LIMIT]}
+            written += run_transaction(db, lambda transaction: _set_payment_status(db, transaction, chunk, entered_payment))
+        return written
+
+
+def _set_payment_status(db, transaction, keys, entered_payment):
+    refs = [db.collection(PERIODS_COLLECTION).document(doc_id) for doc_id in keys]
+    snapshots = list(db.get_all(refs, transaction=transaction))
+    count_reads(len(refs))
+    written = []
+    for snapshot in snapshots:
+        stored = (snapshot.to_dict() or {}).get('records', {}) if snapshot.exists else {}
+        update = {key: {'EnteredPayment': entered_payment} for key in keys[snapshot.id] if key in stored}
+        if not update:
+            continue
+        transaction.set(snapshot.reference, {
+            'Version': firestore.Increment(1),
+            'UpdatedAt': datetime.now(timezone.utc),
+            'records': update,
+        }, merge=True)
+        count_writes(1, doc_size(update))
+        written.append(snapshot.id)
+    return written
+
+
+def records_to_df(doc_id, doc_records):
+    """Builds a normalized DataFrame from one document's records (map or legacy array)."""
+    if isinstance(doc_records, dict):
+        doc_records = list(doc_records.values())
+    df = pd.DataFrame(doc_records)
+    if df.empty:
+        return empty_records()
+    df['id'] = doc_id  # Keep track of which document it came from
+    with timed('normalize'):
+        if 'Date' in df.columns:
+            # Ensure all dates are timezone-aware
+            df['Date'] = normalize_dates(df['Date'])
+        df = compact_records(df)
+    return df
+
+
+def period_grid(period_records, users, start, tz='US/Eastern'):
+    """Reshapes the period's records for all `users` into one user x day x TimeType grid.
+
+    Returns (the 14 tz-aware days of the period, DataFrame indexed by (User, Date) with a
+    column per TimeType, zeros where nothing was entered).
+    """
+    days = pd.date_range(start=period_start(start), periods=PERIOD_DAYS, freq='D', tz=tz)
+    full_index = pd.MultiIndex.from_product([users, days], names=['User', 'Date'])
+    if period_records.empty:
+        return days, pd.DataFrame(0.0, index=full_index, columns=TIME_TYPES)
+
+    hours = pd.to_numeric(period_records['Hours'], errors='coerce').fillna(0).astype(float)
+    # Plain labels, so the reindex below matches them against `users` and TIME_TYPES directly
+    grid = hours.groupby([
+        period_records['User'].astype(object).rename('User'),
+        period_records['Date'].dt.normalize().rename('Date'),
+        period_records['TimeType'].astype(object).rename('TimeType'),
+    ]).sum().unstack('TimeType', fill_value=0)
+    return days, grid.reindex(index=full_index, columns=TIME_TYPES, fill_value=0).astype(float)
+
+
+def period_summary(grid, period_records, ytd_hours, last_updated):
+    """One row per user for the supervisor overview, from the already-built period grid.
+
+    `ytd_hours` maps user -> {TimeType: hours} and `last_updated` maps user -> timestamp.
+    """
+    summary = grid.groupby(level='User', sort=False).sum()
+    summary['Total'] = summary[TIME_TYPES].sum(axis=1)
+    summary['YTD Total'] = pd.Series({user: sum(hours.values()) for user, hours in ytd_hours.items()}, dtype=float)
+    summary['YTD Total'] = summary['YTD Total'].fillna(0)
+    if period_records.empty:
+        summary['Entered for Payment'] = False
+    else:
+        entered = period_records['EnteredPayment'].notna().groupby(period_records['User'].astype(object)).any()
+        summary['Entered for Payment'] = entered.reindex(summary.index, fill_value=False)
+    summary['Last Updated'] = pd.to_datetime(pd.Series(last_updated, dtype=object)).reindex(summary.index)
+    return summary.reset_index()
+
+
+class RecordIndex:
+    """Records grouped by user and sorted by date, so period lookups are a binary search."""
+
+    def __init__(self, df):
+        self.slices = {}  # user -> that user's records sorted by Date
+        self.dates = {}  # user -> DatetimeIndex over the same rows
+        self.last_updated = {}  # user -> latest LastUpdated timestamp
+        if df.empty or 'User' not in df.columns or 'Date' not in df.columns:
+            return
+        df = df.dropna(subset=['Date']).sort_values(['User', 'Date'], kind='stable')
+        for user, user_df in df.groupby('User', sort=False, observed=True):
+            self.slices[user] = user_df
+            self.dates[user] = pd.DatetimeIndex(user_df['Date'])
+            latest = user_df['LastUpdated'].max()
+            if pd.notna(latest):
+                self.last_updated[user] = latest
+
+    def user_range(self, user, start, end):
+        """Returns `user`'s records with start <= Date <= end."""
+        if user not in self.slices:
+            return empty_records()
+        dates = self.dates[user]
+        lo = dates.searchsorted(start, side='left')
+        hi = dates.searchsorted(end, side='right')
+        return self.slices[user].iloc[lo:hi]
+
+    def users_range(self, users, start, end):
+        """Returns the records of every user in `users` with start <= Date <= end."""
+        frames = [self.user_range(user, start, end) for user in users]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return empty_records()
+        return pd.concat(frames, ignore_index=True)
+
+    def user_last_updated(self, user):
+        """Returns the most recent LastUpdated timestamp for `user`, or None."""
+        return self.last_updated.get(user)
+
+
+class RecordCache:
+    """Per-process cache of period documents, loaded on demand one pay period at a time.
+
+    A single user's period is one document read; several users' period is one query on
+    PeriodStart. Either is re-checked at most every CHANGE_CHECK_INTERVAL seconds, so the work
+    per page load does not depend on how much history or staff exists. With `users`, documents
+    of anyone else are ignored.
+
+    With a SnapshotStore, the cache starts from the last snapshot written by any process and
+    only fetches documents updated since. If Firestore cannot be reached, `offline` is set and
+    whatever is cached (or was in the snapshot) keeps being served.
+
+    Reads from Firestore happen outside `lock`, which is only held to swap their results in, so
+    sessions keep reading the cache while another one waits on the network. A read that finishes
+    after the document was stored or edited more recently is discarded.
+    """
+
+    def __init__(self, db, users=None, collection=PERIODS_COLLECTION, snapshot=None):
+        self.db = db
+        self.users = list(users) if users is not None else None
+        self.collection = collection
+        self.lock = threading.Lock()
+        self.fetch_locks = {}  # doc id or 'YYYY-MM-DD' -> lock held while it is read, so it is read once
+        self.update_times = {}  # doc id -> Firestore update_time
+        self.frames = {}  # doc id -> normalized DataFrame of that doc's records
+        self.versions = {}  # doc id -> Version field
+        self.period_docs = {}  # 'YYYY-MM-DD' -> ids of the cached documents of that period
+        self.doc_checks = {}  # doc id -> monotonic time it was last read
+        self.period_checks = {}  # 'YYYY-MM-DD' -> monotonic time its query last ran
+        self.updated_at = {}  # doc id -> UpdatedAt field, for the snapshot's high-water mark
+        self.confirmed = {}  # doc id -> (frame, version) as last read, while optimistic changes are applied
+        self.failed_checks = {}  # doc id or 'YYYY-MM-DD' -> monotonic time a read of it last failed
+        self.df = None
+        self._index = None
+        self.snapshot = snapshot
+        self.snapshot_saved = float('-inf')  # monotonic time of the last snapshot written or restored
+        self.offline = False
+        if snapshot is not None:
+            self._restore()
+
+    def _store(self, snapshot):
+        doc_data = snapshot.to_dict() or {}
+        count_reads(1, doc_size(doc_data))
+        self.update_times[snapshot.id] = snapshot.update_time
+        self.confirmed.pop(snapshot.id, None)
+        self.versions[snapshot.id] = doc_data.get('Version', 0)
+        if doc_data.get('UpdatedAt') is not None:
+            self.updated_at[snapshot.id] = doc_data['UpdatedAt']
+        self.frames[snapshot.id] = records_to_df(snapshot.id, doc_data.get('records', []))
+        if 'PeriodStart' in doc_data:
+            self.period_docs.setdefault(doc_data['PeriodStart'], set()).add(snapshot.id)
+        self.doc_checks[snapshot.id] = time.monotonic()
+        self.df = None
+        self._index = None
+
+    def _drop(self, doc_id):
+        self.update_times.pop(doc_id, None)
+        self.confirmed.pop(doc_id, None)
+        self.versions.pop(doc_id, None)
+        self.updated_at.pop(doc_id, None)
+        self.frames.pop(doc_id, None)
+        for doc_ids in self.period_docs.values():
+            doc_ids.discard(doc_id)
+        self.df = None
+        self._index = None
+
+    def _fetch(self, doc_id):
+        # Network read; call without holding `lock`
+        return self.db.collection(self.collection).document(doc_id).get(retry=PROBE_RETRY, timeout=PROBE_TIMEOUT)
+
+    def _apply(self, doc_id, snapshot, started):
+        # Call with `lock` held; skips a read that started before the cache last stored or edited the document
+        if self.doc_checks.get(doc_id, float('-inf')) > started:
+            count_reads(1)
+            return
+        if snapshot is not None and snapshot.exists:
+            self._store(snapshot)
+        else:
+            count_reads(1)
+            self._drop(doc_id)
+            self.doc_checks[doc_id] = time.monotonic()
+
+    def _reload(self, doc_id):
+        started = time.monotonic()
+        with timed('load'):
+            snapshot = self._fetch(doc_id)
+            with self.lock:
+                self._apply(doc_id, snapshot, started)
+
+    def _wanted(self, doc_id):
+        # Period document ids are '<user>_<YYYY-MM-DD>'
+        return self.users is None or doc_id.rsplit('_', 1)[0] in self.users
+
+    def _load_period(self, period):
+        query = self.db.collection(self.collection).where('PeriodStart', '==', period)
+        started = time.monotonic()
+        with self.lock:
+            first = period not in self.period_checks
+        with timed('load'):
+            if first:
+                snapshots = [snapshot for snapshot in query.stream(retry=PROBE_RETRY, timeout=PROBE_TIMEOUT)]
+                with self.lock:
+                    for snapshot in snapshots:
+                        if self._wanted(snapshot.id):
+                            self._apply(snapshot.id, snapshot, started)
+                    self.period_checks[period] = time.monotonic()
+                return
+            # Keys-only query: returns names and update times without the records
+            names = [snapshot for snapshot in query.select(['__name__']).stream(retry=PROBE_RETRY, timeout=PROBE_TIMEOUT)]
+            count_reads(len(names))
+            with self.lock:
+                changed = [
+                    snapshot.id
+                    for snapshot in names
+                    if self._wanted(snapshot.id) and self.update_times.get(snapshot.id) != snapshot.update_time
+                ]
+                removed = self.period_docs.get(period, set()) - {snapshot.id for snapshot in names}
+            snapshots = {doc_id: self._fetch(doc_id) for doc_id in changed}
+            with self.lock:
+                for doc_id, snapshot in snapshots.items():
+                    self._apply(doc_id, snapshot, started)
+                for doc_id in removed:
+                    if self.doc_checks.get(doc_id, float('-inf')) <= started:
+                        self._drop(doc_id)
+                self.period_checks[period] = time.monotonic()
+
+    def _restore(self):
+        loaded = self.snapshot.load()
+        if loaded is None:
+            return
+        records, meta = loaded
+        self.snapshot_saved = time.monotonic()
+        with timed('restore snapshot'):
+            frames = dict(iter(records.groupby('id', observed=True))) if not records.empty else {}
+            for doc_id, doc in meta.get('docs', {}).items():
+                if not self._wanted(doc_id):
+                    continue
+                frame = frames.get(doc_id)
+                self.frames[doc_id] = frame.reset_index(drop=True) if frame is not None else empty_records()
+                self.versions[doc_id] = doc.get('Version', 0)
+                if doc.get('update_time'):
+                    self.update_times[doc_id] = datetime.fromisoformat(doc['update_time'])
+                if doc.get('UpdatedAt'):
+                    self.updated_at[doc_id] = datetime.fromisoformat(doc['UpdatedAt'])
+                if doc.get('PeriodStart'):
+                    self.period_docs.setdefault(doc['PeriodStart'], set()).add(doc_id)
+        if not meta.get('high_water'):
+            return
+        # Only documents written since the snapshot; what it holds is then as fresh as a full load
+        query = self.db.collection(self.collection).where(
+            'UpdatedAt', '>', datetime.fromisoformat(meta['high_water']) - CLOCK_MARGIN
+        )
+        try:
+            with timed('load'):
+                for snapshot in query.stream(retry=PROBE_RETRY, timeout=PROBE_TIMEOUT):
+                    if self._wanted(snapshot.id):
+                        self._store(snapshot)
+                    else:
+                        count_reads(1)
+        except OFFLINE_ERRORS:
+            self.offline = True
+            return
+        now = time.monotonic()
+        for period in meta.get('periods', []):
+            self.period_checks[period] = now
+        for doc_id in self.frames:
+            self.doc_checks[doc_id] = now
+
+    def save_snapshot(self, force=False):
+        """Writes the cache to its SnapshotStore, at most every SNAPSHOT_INTERVAL seconds unless `force`."""
+        if self.snapshot is None or self.offline:
+            return
+        if not force and time.monotonic() - self.snapshot_saved < SNAPSHOT_INTERVAL:
+            return
+        records = self.records()
+        with self.lock:
+            periods = {doc_id: period for period, doc_ids in self.period_docs.items() for doc_id in doc_ids}
+            meta = {
+                'high_water': max(self.updated_at.values()).isoformat() if self.updated_at else None,
+                'periods': sorted(self.period_checks),
+                'docs': {
+                    doc_id: {
+                        'Version': self.versions.get(doc_id, 0),
+                        'PeriodStart': periods.get(doc_id),
+                        'update_time': self.update_times[doc_id].isoformat() if self.update_times.get(doc_id) else None,
+                        'UpdatedAt': self.updated_at[doc_id].isoformat() if doc_id in self.updated_at else None,
+                    }
+                    for doc_id in self.frames
+                },
+            }
+            self.snapshot_saved = time.monotonic()
+        with timed('save snapshot'):
+            try:
+                self.snapshot.save(records, meta)
+            except OSError:
+                pass  # A read-only or full disk only costs the next cold start its head start
+
+    def ensure_period(self, users, start):
+        """Makes sure `users`' documents for the pay period containing `start` are cached and fresh.
+
+        Sets `offline` (and serves what is cached) if Firestore cannot be reached.
+        """
+        start = period_start(start)
+        if len(users) == 1:
+            key = doc_id = period_doc_id(users[0], start)
+            checks = self.doc_checks
+        else:
+            key = period = start.strftime('%Y-%m-%d')
+            checks = self.period_checks
+        with self.lock:
+            fetch_lock = self.fetch_locks.setdefault(key, threading.Lock())
+        # One read per key at a time; whoever waited finds it fresh and returns
+        with fetch_lock:
+            now = time.monotonic()
+            with self.lock:
+                stale = now - checks.get(key, float('-inf')) > CHANGE_CHECK_INTERVAL
+                # While offline, every rerun would otherwise wait out the timeout again
+                retry = now - self.failed_checks.get(key, float('-inf')) > OFFLINE_RETRY_INTERVAL
+            if not (stale and retry):
+                return
+            try:
+                if len(users) == 1:
+                    self._reload(doc_id)
+                else:
+                    self._load_period(period)
+            except OFFLINE_ERRORS:
+                self.mark_offline(key)
+                return
+            with self.lock:
+                self.offline = False
+                self.failed_checks.pop(key, None)
+        self.save_snapshot()
+
+    def mark_offline(self, key):
+        """Records that a read of `key` could not reach Firestore.
+
+        Sets `offline`, which the next successful ensure_period() clears; until then pages skip
+        their other reads, and ensure_period() retries `key` only after OFFLINE_RETRY_INTERVAL.
+        """
+        with self.lock:
+            self.offline = True
+            self.failed_checks[key] = time.monotonic()
+
+    def invalidate_period(self, start):
+        """Forgets that the pay period containing `start` was loaded, so the next ensure_period() runs one
+        full period query (e.g. after writing several of its documents)."""
+        with self.lock:
+            period = period_start(start).strftime('%Y-%m-%d')
+            self.period_checks.pop(period, None)
+            for doc_id in self.period_docs.get(period, set()):
+                self.doc_checks.pop(doc_id, None)
+
+    def invalidate(self, doc_id):
+        """Re-reads a single document, e.g. right after saving it."""
+        self._reload(doc_id)
+
+    def apply_snapshot(self, snapshot, removed=False):
+        """Applies a document change pushed by a snapshot listener; returns True if the cache changed."""
+        with self.lock:
+            if removed:
+                if snapshot.id not in self.update_times:
+                    return False
+                self._drop(snapshot.id)
+                return True
+            if self.update_times.get(snapshot.id) == snapshot.update_time:
+                return False
+            if not self._wanted(snapshot.id):
+                return False
+            self._store(snapshot)
+            return True
+
+    def apply_changes(self, doc_id, changes, version):
+        """Applies not-yet-written `changes` (see diff_period) to a cached document, for an optimistic UI.
+
+        The next read of the document (e.g. invalidate() once the write finished) replaces them.
+        """
+        with self.lock:
+            frame = self.frames.get(doc_id)
+            self.confirmed.setdefault(doc_id, (frame, self.versions.get(doc_id, 0)))
+            if frame is not None and not frame.empty:
+                keys = frame['Date'].dt.strftime('%Y-%m-%d') + '_' + frame['TimeType'].astype(str)
+                frame = frame[~keys.isin(list(changes))]
+            records = [record for record in changes.values() if record is not None]
+            frames = [df for df in [frame, records_to_df(doc_id, records)] if df is not None and not df.empty]
+            self.frames[doc_id] = compact_records(pd.concat(frames, ignore_index=True)) if frames else empty_records()
+            self.versions[doc_id] = version
+            # Not re-read by ensure_period() while the write is still on its way
+            self.doc_checks[doc_id] = time.monotonic()
+            self.df = None
+            self._index = None
+
+    def revert(self, doc_id):
+        """Drops the optimistic changes to a document, e.g. when its write failed and it cannot be re-read."""
+        with self.lock:
+            if doc_id not in self.confirmed:
+                return
+            frame, version = self.confirmed.pop(doc_id)
+            if frame is None:
+                self.frames.pop(doc_id, None)
+            else:
+                self.frames[doc_id] = frame
+            self.versions[doc_id] = version
+            self.doc_checks.pop(doc_id, None)  # Re-read as soon as the database is back
+            self.df = None
+            self._index = None
+
+    def version(self, doc_id):
+        """Version of a cached document (0 if it does not exist yet)."""
+        with self.lock:
+            return self.versions.get(doc_id, 0)
+
+    def records(self):
+        """Returns all cached records as one DataFrame (call ensure_period first)."""
+        with self.lock:
+            if self.df is None:
+                with timed('build records'):
+                    frames = [frame for frame in self.frames.values() if not frame.empty]
+                    if frames:
+                        # Per-document categories differ, so re-categorize once over the combined frame
+                        self.df = compact_records(pd.concat(frames, ignore_index=True))
+                    else:
+                        self.df = empty_records()
+            return self.df
+
+    def index(self):
+        """Returns a RecordIndex over the cached records, rebuilt only when they change."""
+        df = self.records()
+        with self.lock:
+            if self._index is None:
+                with timed('build index'):
+                    self._index = RecordIndex(df)
+            return self._index
+
+
+@st.cache_resource
+def get_record_cache(_db):
+    """The process's RecordCache, shared by every session.
+
+    It holds everyone's documents; pages pick the users they show when reading, so staff
+    changes do not need a new cache. A Firestore-backed cache starts from, and keeps writing,
+    the on-disk snapshot.
+    """
+    snapshot = None if os.environ.get('TTA_BACKEND') == 'memory' else snapshot_store()
+    return RecordCache(_db, snapshot=snapshot)
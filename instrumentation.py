@@ -0,0 +1,103 @@
+"""Timers and Firestore counters for the current script run.
+
+Streamlit runs each session's script in its own thread, so metrics are collected per thread:
+call start_run() at the top of the script, wrap hot paths in `with timed('name'):`, and record
+document traffic with count_reads()/count_writes(). Set TTA_METRICS_LOG=1 to also log one JSON
+line per run through the `tta_timesheet.metrics` logger.
+"""
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger('tta_timesheet.metrics')
+if os.environ.get('TTA_METRICS_LOG') and not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+_local = threading.local()
+_process_lock = threading.Lock()
+# Counters summed over every run in this process, to see how well the caches are doing
+process_totals = defaultdict(int)
+
+
+class RunMetrics:
+    """Timings (seconds, with call counts) and counters for one script run."""
+
+    def __init__(self, label=''):
+        self.label = label
+        self.started = time.perf_counter()
+        self.timings = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+
+    def as_dict(self):
+        return {
+            'run': self.label,
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 1),
+            'timings_ms': {name: round(seconds * 1000, 1) for name, seconds in self.timings.items()},
+            'calls': dict(self.calls),
+            'counters': dict(self.counters),
+        }
+
+
+def start_run(label=''):
+    """Starts collecting metrics for a new script run on this thread."""
+    _local.metrics = RunMetrics(label)
+    return _local.metrics
+
+
+def current():
+    """Metrics of the run on this thread (background threads get their own)."""
+    if getattr(_local, 'metrics', None) is None:
+        _local.metrics = RunMetrics('background')
+    return _local.metrics
+
+
+@contextlib.contextmanager
+def timed(name):
+    """Adds the time spent in the block to the current run's `name` timer."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = current()
+        metrics.timings[name] += time.perf_counter() - start
+        metrics.calls[name] += 1
+
+
+def _count(kind, documents, size):
+    metrics = current()
+    metrics.counters[kind] += documents
+    metrics.counters[f'{kind}_bytes'] += size
+    with _process_lock:
+        process_totals[kind] += documents
+        process_totals[f'{kind}_bytes'] += size
+
+
+def doc_size(data):
+    """Approximate size in bytes of a document's data."""
+    if not data:
+        return 0
+    return len(json.dumps(data, default=str))
+
+
+def count_reads(documents, size=0):
+    """Records `documents` Firestore document reads totalling `size` bytes."""
+    _count('reads', documents, size)
+
+
+def count_writes(documents, size=0):
+    """Records `documents` Firestore document writes totalling `size` bytes."""
+    _count('writes', documents, size)
+
+
+def finish_run():
+    """Returns the current run's metrics as a dict, logging it when TTA_METRICS_LOG is set."""
+    summary = current().as_dict()
+    if os.environ.get('TTA_METRICS_LOG'):
+        logger.info(json.dumps(summary))
+    return summary
@@ -0,0 +1,75 @@
+import threading
+import time
+import weakref
+
+import streamlit as st
+
+from data_store import PERIODS_COLLECTION
+
+# Listeners no session has polled for this long (seconds) are closed
+LISTENER_IDLE_SECONDS = 60
+# At most this many periods are listened to at once; the least recently created is closed first
+MAX_LISTENERS = 8
+
+_listeners = weakref.WeakSet()
+
+
+class PeriodListener:
+    """Keeps a RecordCache current for one pay period through a Firestore snapshot listener.
+
+    Firestore calls back on its own thread with only the documents that changed; those are
+    applied to the cache and `generation` is bumped, which sessions poll without any reads.
+    Sessions call touch() while they use it, so close_idle_listeners() can stop the ones
+    nobody is watching any more.
+    """
+
+    def __init__(self, db, record_cache, period_start):
+        self.record_cache = record_cache
+        self.period_start = period_start
+        self.generation = 0
+        self.closed = False
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        query = db.collection(PERIODS_COLLECTION).where('PeriodStart', '==', period_start)
+        self.watch = query.on_snapshot(self._on_snapshot)
+        _listeners.add(self)
+
+    def _on_snapshot(self, snapshots, changes, read_time):
+        changed = False
+        for change in changes:
+            removed = change.type.name == 'REMOVED'
+            changed = self.record_cache.apply_snapshot(change.document, removed=removed) or changed
+        if changed:
+            with self.lock:
+                self.generation += 1
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.watch.unsubscribe()
+
+
+def close_idle_listeners():
+    """Stops every listener that no session has polled for LISTENER_IDLE_SECONDS."""
+    now = time.monotonic()
+    for listener in list(_listeners):
+        if not listener.closed and now - listener.last_used > LISTENER_IDLE_SECONDS:
+            listener.close()
+
+
+@st.cache_resource(
+    max_entries=MAX_LISTENERS,
+    validate=lambda listener: not listener.closed,
+    on_release=lambda listener: listener.close(),
+)
+def get_period_listener(_db, _record_cache, period_start):
+    """One listener per pay period ('YYYY-MM-DD'), shared by every session in this process.
+
+    It feeds the process's RecordCache (see get_record_cache). A closed listener is replaced on the next call.
+    """
+    return PeriodListener(_db, _record_cache, period_start)
@@ -0,0 +1,312 @@
+"""In-process stand-in for the parts of the Firestore client this app uses.
+
+Select it with TTA_BACKEND=memory. It implements the same surface data_store relies on:
+collection()/document()/get()/set(merge=...)/stream(), where/order_by/limit/start_after/select
+queries, on_snapshot() listeners, batch(), get_all() and run_transaction(), including the
+Increment and DELETE_FIELD sentinels. Every document read and write is counted in `reads`/`writes`, and `seed()` fills it
+with synthetic employees and years of history for benchmarks.
+"""
+import copy
+import threading
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from firebase_admin import firestore
+
+_OPERATORS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    'in': lambda a, b: a in b,
+}
+
+
+def _merge(target, data):
+    # Same semantics as set(..., merge=True): nested maps merge leaf by leaf
+    for key, value in data.items():
+        if value is firestore.DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, firestore.Increment):
+            current = target.get(key, 0)
+            target[key] = (current if isinstance(current, (int, float)) else 0) + value.value
+        elif isinstance(value, dict):
+            child = target.get(key)
+            if not isinstance(child, dict):
+                child = target[key] = {}
+            _merge(child, value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+class MemorySnapshot:
+    """Read-only view of one document, like firestore.DocumentSnapshot."""
+
+    def __init__(self, reference, data, update_time):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self.update_time = update_time
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self.exists else None
+
+    def get(self, field):
+        return self._data.get(field) if self.exists else None
+
+
+class MemoryDocument:
+    """Reference to one document, like firestore.DocumentReference."""
+
+    def __init__(self, client, collection, doc_id):
+        self.client = client
+        self.collection = collection
+        self.id = doc_id
+
+    def get(self, transaction=None, retry=None, timeout=None):
+        with self.client.lock:
+            self.client.reads += 1
+            data, update_time = self.client._docs(self.collection).get(self.id, (None, None))
+            return MemorySnapshot(self, data, update_time)
+
+    def set(self, data, merge=False):
+        with self.client.lock:
+            self.client._write(self, data, merge)
+
+
+class MemoryQuery:
+    """Collection reference and query, like firestore.CollectionReference/Query."""
+
+    def __init__(self, client, collection, filters=(), order=None, count=None, after=None, fields=None):
+        self.client = client
+        self.collection = collection
+        self.filters = filters
+        self.order = order
+        self.count = count
+        self.after = after
+        self.fields = fields
+
+    def _copy(self, **changes):
+        args = dict(filters=self.filters, order=self.order, count=self.count, after=self.after, fields=self.fields)
+        args.update(changes)
+        return MemoryQuery(self.client, self.collection, **args)
+
+    def document(self, doc_id):
+        return MemoryDocument(self.client, self.collection, doc_id)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self.filters + ((field, _OPERATORS[op], value),))
+
+    def order_by(self, field):
+        return self._copy(order=field)
+
+    def limit(self, count):
+        return self._copy(count=count)
+
+    def start_after(self, snapshot):
+        return self._copy(after=snapshot)
+
+    def select(self, fields):
+        return self._copy(fields=[field for field in fields if field != '__name__'])
+
+    def matches(self, data):
+        return data is not None and all(field in data and op(data[field], value) for field, op, value in self.filters)
+
+    def on_snapshot(self, callback):
+        return self.client._listen(self, callback)
+
+    def stream(self, retry=None, timeout=None):
+        with self.client.lock:
+            matches = [
+                (doc_id, data, update_time)
+                for doc_id, (data, update_time) in self.client._docs(self.collection).items()
+                if self.matches(data)
+            ]
+            sort_key = (lambda m: (m[1].get(self.order), m[0])) if self.order else (lambda m: m[0])
+            matches.sort(key=sort_key)
+            if self.after is not None:
+                after_key = sort_key((self.after.id, self.after._data, None))
+                matches = [m for m in matches if sort_key(m) > after_key]
+            if self.count is not None:
+                matches = matches[:self.count]
+            self.client.reads += len(matches)
+            snapshots = []
+            for doc_id, data, update_time in matches:
+                if self.fields is not None:
+                    data = {field: data[field] for field in self.fields if field in data}
+                snapshots.append(MemorySnapshot(self.document(doc_id), data, update_time))
+        return iter(snapshots)
+
+
+class MemoryBatch:
+    """Buffers set() calls and applies them together on commit(); also serves as a transaction."""
+
+    def __init__(self, client):
+        self.client = client
+        self.operations = []
+
+    def set(self, reference, data, merge=False):
+        self.operations.append((reference, data, merge))
+
+    def commit(self):
+        with self.client.lock:
+            for reference, data, merge in self.operations:
+                self.client._write(reference, data, merge)
+        self.operations = []
+
+
+class MemoryWatch:
+    """A registered on_snapshot listener; callbacks run on their own thread, like Firestore's."""
+
+    def __init__(self, client, query, callback):
+        self.client = client
+        self.query = query
+        self.callback = callback
+
+    def notify(self, changes):
+        snapshots = [change.document for change in changes]
+        self.client.reads += len(snapshots)
+        threading.Thread(target=self.callback, args=(snapshots, changes, datetime.now(timezone.utc)), daemon=True).start()
+
+    def unsubscribe(self):
+        with self.client.lock:
+            if self in self.client.listeners:
+                self.client.listeners.remove(self)
+
+
+def _change(kind, snapshot):
+    return SimpleNamespace(type=SimpleNamespace(name=kind), document=snapshot)
+
+
+class MemoryClient:
+    """In-memory stand-in for firestore.client()."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.collections = {}  # collection name -> {doc id: (data, update_time)}
+        self.reads = 0
+        self.writes = 0
+        self.listeners = []
+        self._clock = datetime.now(timezone.utc)
+
+    def _docs(self, collection):
+        return self.collections.setdefault(collection, {})
+
+    def _write(self, reference, data, merge):
+        docs = self._docs(reference.collection)
+        existing = docs.get(reference.id, (None, None))[0]
+        if merge and existing is not None:
+            data = _merge(copy.deepcopy(existing), data)
+        else:
+            data = _merge({}, data)
+        # Strictly increasing update times, so change detection never sees a tie
+        self._clock = max(self._clock + timedelta(microseconds=1), datetime.now(timezone.utc))
+        docs[reference.id] = (data, self._clock)
+        self.writes += 1
+
+        for watch in self.listeners:
+            if watch.query.collection != reference.collection:
+                continue
+            snapshot = MemorySnapshot(reference, copy.deepcopy(data), self._clock)
+            if watch.query.matches(data):
+                watch.notify([_change('ADDED' if not watch.query.matches(existing) else 'MODIFIED', snapshot)])
+            elif watch.query.matches(existing):
+                watch.notify([_change('REMOVED', snapshot)])
+
+    def _listen(self, query, callback):
+        watch = MemoryWatch(self, query, callback)
+        with self.lock:
+            self.listeners.append(watch)
+            initial = list(query.stream())
+            self.reads -= len(initial)  # counted again by notify()
+            watch.notify([_change('ADDED', snapshot) for snapshot in initial])
+        return watch
+
+    def collection(self, name):
+        return MemoryQuery(self, name)
+
+    def batch(self):
+        return MemoryBatch(self)
+
+    def get_all(self, references, transaction=None, retry=None, timeout=None):
+        return [reference.get() for reference in references]
+
+    def run_transaction(self, func):
+        """Runs func(transaction) with all other access blocked, committing its writes at the end."""
+        with self.lock:
+            transaction = MemoryBatch(self)
+            result = func(transaction)
+            transaction.commit()
+            return result
+
+    def reset_counters(self):
+        self.reads = 0
+        self.writes = 0
+
+
+_shared = MemoryClient()
+
+
+def shared_client():
+    """The process-wide MemoryClient that get_db() returns for TTA_BACKEND=memory."""
+    return _shared
+
+
+def seed(client, users, years, supervisor=None, end=None, random_seed=0):
+    """Fills `client` with `years` of bi-weekly period documents for each name in `users`.
+
+    Everyone works most weekdays with occasional sick, vacation and holiday days and is
+    added to the user directory, `supervisor` (if given) in that role. The totals
+    aggregates are rebuilt afterwards so the app sees a consistent database.
+    """
+    # Imported here because data_store imports this module for get_db()
+    from data_store import PERIODS_COLLECTION, period_doc_id, record_key
+    from migrate_storage import rebuild_totals
+    from pay_periods import PERIOD_DAYS, period_start
+    from user_directory import USERS_COLLECTION
+
+    rng = np.random.default_rng(random_seed)
+    last = period_start(end if end is not None else pd.Timestamp.now())
+    starts = pd.date_range(end=last, periods=int(years * 26), freq=f'{PERIOD_DAYS}D')
+    time_types = ['Regular', 'Sick', 'Vacation', 'Holiday']
+
+    batch = client.batch()
+    for start in starts:
+        days = pd.date_range(start, periods=PERIOD_DAYS, freq='D')
+        workdays = days[days.dayofweek < 5]
+        for user in users:
+            records = {}
+            for day in workdays:
+                time_type = rng.choice(time_types, p=[0.9, 0.03, 0.05, 0.02])
+                date = day.strftime('%Y-%m-%d')
+                records[record_key(date, time_type)] = {
+                    'User': user,
+                    'Date': date,
+                    'TimeType': str(time_type),
+                    'Hours': 8.0,
+                    'LastUpdated': (day + pd.Timedelta(hours=17)).strftime('%Y-%m-%d %H:%M:%S'),
+                    'EnteredPayment': '',
+                }
+            batch.set(client.collection(PERIODS_COLLECTION).document(period_doc_id(user, start)), {
+                'User': user,
+                'PeriodStart': start.strftime('%Y-%m-%d'),
+                'Version': 1,
+                'UpdatedAt': datetime.now(timezone.utc),
+                'records': records,
+            })
+    for order, user in enumerate(users):
+        batch.set(client.collection(USERS_COLLECTION).document(user), {
+            'Name': user,
+            'Role': 'supervisor' if user == supervisor else 'employee',
+            'Active': True,
+            'Order': order,
+        })
+    batch.commit()
+    rebuild_totals(client)
+    client.reset_counters()
@@ -0,0 +1,159 @@
+"""Copies the legacy `sheet` documents (one records array per user) into per-period documents.
+
+Run from the repository root, using the same service account as the app:
+    python migrate_storage.py --dry-run
+    python migrate_storage.py
+    python migrate_storage.py --rebuild-totals   # recompute the `totals` aggregates from period documents
+"""
+import argparse
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from data_store import (
+    BATCH_LIMIT, LEGACY_COLLECTION, PERIODS_COLLECTION, TOTALS_COLLECTION, connect, normalize_dates,
+    period_doc_id, record_key, user_totals_id, year_totals_id
+)
+from pay_periods import period_start
+
+
+def period_documents(doc_id, legacy_records):
+    """Groups one legacy records array into {period doc id: period document}."""
+    df = pd.DataFrame(legacy_records)
+    if df.empty or 'Date' not in df.columns:
+        return {}, 0
+    if 'User' not in df.columns:
+        df['User'] = doc_id
+    df['User'] = df['User'].fillna(doc_id)
+    for col in ['LastUpdated', 'EnteredPayment']:
+        if col not in df.columns:
+            df[col] = ''
+        df[col] = df[col].fillna('').astype(str)
+    df['Hours'] = pd.to_numeric(df['Hours'], errors='coerce').fillna(0)
+
+    dates = normalize_dates(df['Date'])
+    skipped = int(dates.isna().sum())
+    df = df[dates.notna()].copy()
+    df['Date'] = dates[dates.notna()].dt.strftime('%Y-%m-%d')
+
+    # The old editor summed duplicates on display, so merge them the same way
+    df = df.groupby(['User', 'Date', 'TimeType'], as_index=False).agg({
+        'Hours': 'sum',
+        'LastUpdated': 'max',
+        'EnteredPayment': 'max',
+    })
+    df = df[df['Hours'] > 0]
+
+    starts = {date: period_start(date) for date in df['Date'].unique()}
+    df['PeriodStart'] = df['Date'].map(starts)
+
+    documents = {}
+    migrated_at = datetime.now(timezone.utc)
+    for (user, start), period_df in df.groupby(['User', 'PeriodStart']):
+        documents[period_doc_id(user, start)] = {
+            'User': user,
+            'PeriodStart': start.strftime('%Y-%m-%d'),
+            'UpdatedAt': migrated_at,
+            'records': {
+                record_key(record['Date'], record['TimeType']): {
+                    'User': user,
+                    'Date': record['Date'],
+                    'TimeType': record['TimeType'],
+                    'Hours': float(record['Hours']),
+                    'LastUpdated': record['LastUpdated'],
+                    'EnteredPayment': record['EnteredPayment'],
+                }
+                for record in period_df.to_dict('records')
+            },
+        }
+    return documents, skipped
+
+
+def migrate(db, dry_run=False, overwrite=False):
+    existing = set()
+    if not overwrite:
+        existing = {snapshot.id for snapshot in db.collection(PERIODS_COLLECTION).select(['__name__']).stream()}
+
+    batch = db.batch()
+    pending = 0
+    written = 0
+    for legacy_doc in db.collection(LEGACY_COLLECTION).stream():
+        documents, skipped = period_documents(legacy_doc.id, (legacy_doc.to_dict() or {}).get('records', []))
+        if skipped:
+            print(f"{legacy_doc.id}: skipped {skipped} records with unreadable dates")
+
+        for doc_id, document in sorted(documents.items()):
+            if doc_id in existing:
+                print(f"{doc_id}: already exists, leaving it alone")
+                continue
+            print(f"{doc_id}: {len(document['records'])} records")
+            written += 1
+            if dry_run:
+                continue
+            batch.set(db.collection(PERIODS_COLLECTION).document(doc_id), document)
+            pending += 1
+            if pending == BATCH_LIMIT:
+                batch.commit()
+                batch = db.batch()
+                pending = 0
+
+    if pending:
+        batch.commit()
+    print(f"{'Would write' if dry_run else 'Wrote'} {written} period documents")
+
+
+def rebuild_totals(db, dry_run=False):
+    """Recomputes every period, year-to-date and all-time totals document from the period documents."""
+    totals = {}
+    for snapshot in db.collection(PERIODS_COLLECTION).stream():
+        doc_data = snapshot.to_dict() or {}
+        user = doc_data.get('User')
+        start = doc_data.get('PeriodStart')
+        if not user or not start:
+            continue
+        period = totals.setdefault(snapshot.id, {'User': user, 'PeriodStart': start, 'Hours': {}})
+        for record in doc_data.get('records', {}).values():
+            hours = float(record.get('Hours', 0) or 0)
+            time_type = record['TimeType']
+            period['Hours'][time_type] = period['Hours'].get(time_type, 0) + hours
+            year = int(record['Date'][:4])
+            ytd = totals.setdefault(year_totals_id(user, year), {'User': user, 'Year': year, 'Hours': {}})
+            ytd['Hours'][time_type] = ytd['Hours'].get(time_type, 0) + hours
+            lifetime = totals.setdefault(user_totals_id(user), {'User': user, 'Hours': {}})
+            lifetime['Hours'][time_type] = lifetime['Hours'].get(time_type, 0) + hours
+            if record.get('LastUpdated') and record['LastUpdated'] > lifetime.get('LastUpdated', ''):
+                lifetime['LastUpdated'] = record['LastUpdated']
+
+    print(f"{'Would write' if dry_run else 'Writing'} {len(totals)} totals documents")
+    if dry_run:
+        return
+    batch = db.batch()
+    pending = 0
+    for doc_id, document in totals.items():
+        batch.set(db.collection(TOTALS_COLLECTION).document(doc_id), document)
+        pending += 1
+        if pending == BATCH_LIMIT:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split legacy `sheet` records into per-user, per-period documents.")
+    parser.add_argument('--secrets', default='.streamlit/secrets.toml', help="Streamlit secrets file with a [firebase] table")
+    parser.add_argument('--dry-run', action='store_true', help="Only print what would be written")
+    parser.add_argument('--overwrite', action='store_true', help="Replace period documents that already exist")
+    parser.add_argument('--rebuild-totals', action='store_true', help="Only recompute the totals aggregates")
+    args = parser.parse_args()
+
+    db = connect(args.secrets)
+    if not args.rebuild_totals:
+        migrate(db, dry_run=args.dry_run, overwrite=args.overwrite)
+    # Totals are derived data, so they are always rebuilt after a migration
+    rebuild_totals(db, dry_run=args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
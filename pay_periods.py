@@ -0,0 +1,79 @@
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+
+# First day (a Wednesday) of a known bi-weekly pay period; every period is a 14-day step from it.
+# Override with TTA_PAY_PERIOD_EPOCH=YYYY-MM-DD if payroll is ever re-anchored.
+DEFAULT_EPOCH = '2024-12-11'
+PERIOD_DAYS = 14
+
+# Range of periods precomputed by the calendar, as offsets from the epoch (~10 years back, ~30 ahead)
+FIRST_OFFSET = -260
+LAST_OFFSET = 780
+
+
+def _load_epoch():
+    epoch = pd.Timestamp(os.environ.get('TTA_PAY_PERIOD_EPOCH', DEFAULT_EPOCH))
+    if epoch != epoch.normalize() or epoch.tz is not None:
+        raise ValueError(f"TTA_PAY_PERIOD_EPOCH must be a plain date, got {epoch}")
+    return epoch
+
+
+PAY_PERIOD_EPOCH = _load_epoch()
+
+
+def _naive_day(date):
+    date = pd.Timestamp(date)
+    if date.tz is not None:
+        date = date.tz_localize(None)
+    return date.normalize()
+
+
+def period_offset(date):
+    """Number of whole pay periods between the epoch and the period containing `date`."""
+    return (_naive_day(date) - PAY_PERIOD_EPOCH).days // PERIOD_DAYS
+
+
+def period_start(date):
+    """Returns the (naive, midnight) first day of the pay period containing `date`."""
+    return PAY_PERIOD_EPOCH + pd.Timedelta(days=period_offset(date) * PERIOD_DAYS)
+
+
+class PayPeriodCalendar:
+    """Every pay period between FIRST_OFFSET and LAST_OFFSET, with labels, built once per process."""
+
+    def __init__(self, epoch=PAY_PERIOD_EPOCH, first=FIRST_OFFSET, last=LAST_OFFSET):
+        self.epoch = epoch
+        self.first = first
+        offsets = np.arange(first, last + 1)
+        self.starts = epoch + pd.to_timedelta(offsets * PERIOD_DAYS, unit='D')
+        self.labels = list(self.starts.strftime('%m/%d/%Y'))
+        self.positions = {label: i for i, label in enumerate(self.labels)}
+
+    def position(self, date):
+        """Position of the period containing `date` in `starts`/`labels`."""
+        position = period_offset(date) - self.first
+        if not 0 <= position < len(self.labels):
+            raise ValueError(f"{date} is outside the precomputed pay period calendar")
+        return position
+
+    def start_of_label(self, label):
+        """First day of the period shown as `label` ('MM/DD/YYYY')."""
+        return self.starts[self.positions[label]]
+
+    def window(self, date, past, future):
+        """Labels of `past` periods before through `future` periods after the one containing `date`.
+
+        Returns (labels, index of the period containing `date` within them).
+        """
+        position = self.position(date)
+        lo = max(position - past, 0)
+        return self.labels[lo:position + future + 1], position - lo
+
+
+@functools.lru_cache(maxsize=None)
+def get_calendar():
+    """The process-wide PayPeriodCalendar."""
+    return PayPeriodCalendar()
@@ -0,0 +1,103 @@
+"""Hours per user per TimeType over any date range, exported as CSV or Parquet.
+
+Run from the repository root, using the same service account as the app:
+    python report.py --start 2024-01-01 --end 2024-12-31 --out hours_2024.csv
+    python report.py --start 2024-01-01 --end 2024-12-31 --out hours_2024.parquet
+"""
+import argparse
+import io
+
+import pandas as pd
+
+from data_store import PERIODS_COLLECTION, TIME_TYPES, connect
+from instrumentation import count_reads, timed
+from pay_periods import period_start
+
+# Period documents fetched per query page, and records aggregated per chunk;
+# memory use is bounded by these, not by the length of the range
+PAGE_SIZE = 200
+CHUNK_RECORDS = 10_000
+
+
+def stream_period_docs(db, start, end, page_size=PAGE_SIZE):
+    """Yields the period documents overlapping [start, end], one query page at a time."""
+    first = period_start(start).strftime('%Y-%m-%d')
+    last = pd.Timestamp(end).strftime('%Y-%m-%d')
+    query = (
+        db.collection(PERIODS_COLLECTION)
+        .where('PeriodStart', '>=', first)
+        .where('PeriodStart', '<=', last)
+        .order_by('PeriodStart')
+        .limit(page_size)
+    )
+    last_snapshot = None
+    while True:
+        page = query.start_after(last_snapshot) if last_snapshot is not None else query
+        with timed('report query'):
+            snapshots = list(page.stream())
+        count_reads(len(snapshots))
+        yield from snapshots
+        if len(snapshots) < page_size:
+            return
+        last_snapshot = snapshots[-1]
+
+
+def _chunk_totals(records, first, last):
+    df = pd.DataFrame(records, columns=['User', 'Date', 'TimeType', 'Hours'])
+    df['Hours'] = pd.to_numeric(df['Hours'], errors='coerce').fillna(0)
+    # Stored dates are always YYYY-MM-DD, so string comparison is date comparison
+    df = df[(df['Date'] >= first) & (df['Date'] <= last)]
+    return df.groupby(['User', 'TimeType'])['Hours'].sum()
+
+
+def hours_report(db, start, end, page_size=PAGE_SIZE):
+    """Returns a DataFrame indexed by User with one column per TimeType plus Total, for Date in [start, end]."""
+    first = pd.Timestamp(start).strftime('%Y-%m-%d')
+    last = pd.Timestamp(end).strftime('%Y-%m-%d')
+
+    totals = None
+    records = []
+    for snapshot in stream_period_docs(db, start, end, page_size):
+        records.extend((snapshot.to_dict() or {}).get('records', {}).values())
+        if len(records) >= CHUNK_RECORDS:
+            chunk = _chunk_totals(records, first, last)
+            totals = chunk if totals is None else totals.add(chunk, fill_value=0)
+            records = []
+    if records:
+        chunk = _chunk_totals(records, first, last)
+        totals = chunk if totals is None else totals.add(chunk, fill_value=0)
+
+    if totals is None or totals.empty:
+        report = pd.DataFrame(0.0, index=pd.Index([], name='User'), columns=TIME_TYPES)
+    else:
+        report = totals.unstack('TimeType', fill_value=0).reindex(columns=TIME_TYPES, fill_value=0)
+    report['Total'] = report[TIME_TYPES].sum(axis=1)
+    return report
+
+
+def report_bytes(report, fmt):
+    """Serializes a report as 'csv' or 'parquet' (Parquet needs pyarrow or fastparquet)."""
+    if fmt == 'parquet':
+        buffer = io.BytesIO()
+        report.to_parquet(buffer)
+        return buffer.getvalue()
+    return report.to_csv().encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export hours per user per TimeType over a date range.")
+    parser.add_argument('--start', required=True, help="First day, YYYY-MM-DD")
+    parser.add_argument('--end', required=True, help="Last day, YYYY-MM-DD")
+    parser.add_argument('--out', required=True, help="Output file ending in .csv or .parquet")
+    parser.add_argument('--secrets', default='.streamlit/secrets.toml', help="Streamlit secrets file with a [firebase] table")
+    args = parser.parse_args()
+
+    report = hours_report(connect(args.secrets), args.start, args.end)
+    fmt = 'parquet' if args.out.endswith('.parquet') else 'csv'
+    with open(args.out, 'wb') as f:
+        f.write(report_bytes(report, fmt))
+    print(f"Wrote {len(report)} users to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""On-disk snapshot of the record cache, so a cold start does not re-read Firestore period by period.
+
+The cached records are written as one Arrow IPC file whose schema metadata holds each
+document's Version, PeriodStart and update times, the pay periods that were fully loaded, and a
+high-water mark: the latest `UpdatedAt` of any cached document. A new process memory-maps the
+snapshot back and then only fetches documents whose UpdatedAt is later. Set TTA_SNAPSHOT_DIR to
+choose the directory, or to '' to turn snapshots off; they are also skipped without pyarrow.
+"""
+import json
+import os
+import uuid
+from datetime import timedelta
+
+import pandas as pd
+
+SNAPSHOT_DIR = os.environ.get('TTA_SNAPSHOT_DIR', '.tta_snapshot')
+# A snapshot is rewritten at most this often (seconds), after the cache changed
+SNAPSHOT_INTERVAL = 300
+# UpdatedAt comes from each writer's clock, so look this far behind the high-water mark
+CLOCK_MARGIN = timedelta(minutes=5)
+# Schema metadata key holding the JSON metadata next to the records
+META_KEY = b'tta_snapshot'
+
+
+class SnapshotStore:
+    """One snapshot: `<name>.arrow` holding the records, with the metadata in its schema."""
+
+    def __init__(self, directory, name='records'):
+        self.directory = directory
+        self.path = os.path.join(directory, f'{name}.arrow')
+
+    def load(self):
+        """Returns (records DataFrame, metadata dict), or None if there is no readable snapshot."""
+        try:
+            from pyarrow import feather
+        except ImportError:
+            return None
+        if not os.path.exists(self.path):
+            return None
+        try:
+            table = feather.read_table(self.path, memory_map=True)
+            meta = json.loads((table.schema.metadata or {})[META_KEY])
+        except (OSError, ValueError, KeyError):
+            return None
+        return table.to_pandas(), meta
+
+    def save(self, records, meta):
+        """Replaces the snapshot; returns False if pyarrow is not installed.
+
+        Records and metadata are one file, written under a name unique to this writer and then
+        renamed into place, so concurrent writers (caches or processes) never mix their output.
+        """
+        try:
+            import pyarrow as pa
+            from pyarrow import feather
+        except ImportError:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        table = pa.Table.from_pandas(pd.DataFrame(records).reset_index(drop=True), preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), META_KEY: json.dumps(meta)})
+        temporary = f'{self.path}.{os.getpid()}.{uuid.uuid4().hex}.tmp'
+        try:
+            feather.write_feather(table, temporary)
+            os.replace(temporary, self.path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return True
+
+
+def snapshot_store(directory=SNAPSHOT_DIR):
+    """The process's SnapshotStore, or None when snapshots are turned off."""
+    if not directory:
+        return None
+    return SnapshotStore(directory)
@@ -1,33 +1,35 @@
 import streamlit as st
-import firebase_admin
-from firebase_admin import credentials, firestore
 import pandas as pd
+import os
 import pytz
+import uuid
 from datetime import datetime
 
+from data_store import (
+    OFFLINE_ERRORS, TIME_TYPES, diff_period, get_db, get_record_cache, history_frame, load_period_history,
+    load_totals, period_doc_id, period_grid, period_summary, replay_period, set_payment_status, user_totals_id,
+    year_totals_id
+)
+from instrumentation import finish_run, process_totals, start_run, timed
+from live_sync import close_idle_listeners, get_period_listener
+from user_directory import (
+    DEFAULT_DIRECTORY, ROLES, active_users, is_supervisor, load_directory, name_problem, save_user
+)
+from pay_periods import get_calendar
+from report import hours_report, report_bytes
+from write_queue import get_save_queue
+
 # Set page to wide mode and title
 st.set_page_config(
     page_title="TTA Timesheet",
     layout="wide"
 )
 
-# Initialize Firebase (only do this once)
-if not firebase_admin._apps:
-    cred = credentials.Certificate({
-        "type": st.secrets["firebase"]["type"],
-        "project_id": st.secrets["firebase"]["project_id"],
-        "private_key_id": st.secrets["firebase"]["private_key_id"],
-        "private_key": st.secrets["firebase"]["private_key"],
-        "client_email": st.secrets["firebase"]["client_email"],
-        "client_id": st.secrets["firebase"]["client_id"],
-        "auth_uri": st.secrets["firebase"]["auth_uri"],
-        "token_uri": st.secrets["firebase"]["token_uri"],
-        "auth_provider_x509_cert_url": st.secrets["firebase"]["auth_provider_x509_cert_url"],
-        "client_x509_cert_url": st.secrets["firebase"]["client_x509_cert_url"]
-    })
-    firebase_admin.initialize_app(cred)
+# Collect timings and Firestore counters for this script run
+start_run(st.session_state.get('user_select', ''))
 
-db = firestore.client()
+# Firebase client (or the in-memory stand-in), created once per process
+db = get_db()
 
 # Initialize session states
 if 'authenticated' not in st.session_state:
@@ -36,9 +38,64 @@ if 'sidebar_state' not in st.session_state:
     st.session_state.sidebar_state = False
 if 'selected_week' not in st.session_state:
     st.session_state.selected_week = None
+if 'base_versions' not in st.session_state:
+    st.session_state.base_versions = {}
+if 'save_message' not in st.session_state:
+    st.session_state.save_message = None
+if 'session_key' not in st.session_state:
+    st.session_state.session_key = uuid.uuid4().hex
 
 eastern = pytz.timezone('US/Eastern')
 
+# How many past pay periods the week selector offers
+PAST_PERIODS_SHOWN = 26
+# How often live mode checks for pushed changes (no Firestore reads involved)
+LIVE_POLL_SECONDS = 5
+# Employees whose detail grids the supervisor view renders per page
+DETAIL_PAGE_SIZE = 5
+# How often a session with saves still being written checks whether they finished
+SAVE_POLL_SECONDS = 1
+
+@st.cache_data(ttl=300)
+def build_report(_db, start, end):
+    """Payroll report for [start, end], cached for a few minutes per range."""
+    return hours_report(_db, start, end)
+
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+def watch_period(record_cache, period):
+    """Polls the period listener's in-memory generation; reruns the page only when the period changed.
+
+    The listener is looked up on every poll, so one closed or evicted meanwhile is replaced.
+    """
+    listener = get_period_listener(db, record_cache, period)
+    listener.touch()
+    if listener.generation != st.session_state.get('live_generation'):
+        load_totals.clear()
+        st.rerun(scope="app")
+
+@st.fragment(run_every=SAVE_POLL_SECONDS)
+def watch_saves(save_queue):
+    """Reports this session's finished background saves, rerunning the page once any landed."""
+    results = save_queue.results(st.session_state.session_key)
+    if not results:
+        return
+    for doc_id, status, detail in results:
+        if status == 'saved':
+            st.session_state.save_message = ('success', "Changes saved")
+        elif status == 'conflict':
+            # Someone else saved this period first; the cache now shows their hours
+            st.session_state.base_versions[doc_id] = detail
+            st.session_state.save_message = (
+                'error',
+                "Someone else saved this period before your changes were written, so they were not saved. "
+                "The latest hours are now shown; enter your changes again."
+            )
+        else:
+            # Edit from whatever the cache now holds for the document
+            st.session_state.base_versions.pop(doc_id, None)
+            st.session_state.save_message = ('error', f"Your changes could not be saved: {detail}")
+    st.rerun(scope="app")
+
 def check_password():
     """Returns `True` if the user had the correct password."""
     def password_entered():
@@ -61,22 +118,25 @@ def check_password():
     return True
 
 if check_password():
-    # Get all data from Firestore
-    docs = db.collection('sheet').stream()
-    records = []
-    for doc in docs:
-        doc_data = doc.to_dict()
-        if 'records' in doc_data:  # Check if document has records array
-            for record in doc_data['records']:
-                record['id'] = doc.id  # Keep track of which document it came from
-                records.append(record)
-
-    df = pd.DataFrame(records)
-    if not df.empty and 'Date' in df.columns:
-        # Ensure all dates are timezone-aware
-        df['Date'] = pd.to_datetime(df['Date'], format='mixed').apply(
-            lambda x: x.tz_convert('US/Eastern') if x.tz else x.tz_localize('US/Eastern')
-        )
+    # Per-process record cache of everyone's period documents, filled one period at a time
+    record_cache = get_record_cache(db)
+    
+    # Staff and roles from the cached user directory (the defaults while Firestore is unreachable,
+    # until a period read in ensure_period() below succeeds again)
+    directory = None
+    if not record_cache.offline:
+        try:
+            directory = load_directory(db)
+        except OFFLINE_ERRORS:
+            record_cache.mark_offline('directory')
+    if directory is None:
+        directory = [dict(entry) for entry in DEFAULT_DIRECTORY]
+    default_users = active_users(directory)
+    
+    # Saves are written in the background; watch for their outcome while any are outstanding
+    save_queue = get_save_queue(db, record_cache)
+    if save_queue.busy(st.session_state.session_key):
+        watch_saves(save_queue)
     
     # Initialize user variable
     user = "Stacey"
@@ -84,19 +144,27 @@ if check_password():
     
     # Sidebar for user selection
     with st.sidebar:
-        default_users = ["Stacey", "Aaron", "Daisy","Cindy", "Alan"]
         user = st.selectbox(
             "Select User",
             options=["Select a user"] + default_users,
             key="user_select",
-            index=default_users.index("Stacey") + 1  # +1 because of "Select a user" option
+            index=1 if default_users else 0  # +1 because of "Select a user" option
         )
+        supervisor = is_supervisor(directory, user)
         if user != "Select a user":
             st.success(f"Hours for {user} successfully loaded. Please close sidebar with arrow above.")
+        if supervisor:
+            live_mode = st.toggle(
+                "Live updates",
+                key="live_mode",
+                help="Refresh automatically when hours in the selected period change"
+            )
+        # Filled in at the end of the run, once everything has been timed
+        debug_panel = st.empty()
 
-    # Display the logo
+    # Display the logo (next to this file, so the app runs from any directory)
     st.image(
-        "tta_logo.png",  
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "tta_logo.png"),
         use_container_width=False,  # Replace deprecated use_column_width
         width=200
     )
@@ -104,48 +172,14 @@ if check_password():
     # Main content
     if user != "Select a user":        
         # Add title
-        st.title(f"{'Viewing' if user == 'Alan' else f'Hours for {user}'}")
-        
-        # Get current date and create future dates
-        current_date = pd.Timestamp.now()
-        future_date = current_date + pd.Timedelta(weeks=20)
-
-        all_dates = pd.date_range(
-            start=current_date,
-            end=future_date,
-            freq='D'
-        )
-        
-        # Convert to DataFrame to match user_df structure
-        all_dates_df = pd.DataFrame({'Date': all_dates})
-        
-        # Get unique weeks starting on Tuesday
-        dates = all_dates_df['Date'].dt.to_period('W-TUE').unique()
-        dates = dates[::2]  # Skip every other week
-        week_starts = [date.start_time.strftime('%m/%d/%Y') for date in dates]
+        st.title(f"{'Viewing' if supervisor else f'Hours for {user}'}")
         
-        # Find the current bi-weekly period
-        current_date = pd.Timestamp.now()
-        current_period = current_date.to_period('W-TUE')
-        current_period_start = current_period.start_time
-
-        # If current date is before the period start, adjust back
-        if current_date < current_period_start:
-            current_period_start -= pd.Timedelta(weeks=2)
-
-        # Format current period start to match week_starts format
-        current_period_str = current_period_start.strftime('%m/%d/%Y')
+        # Bi-weekly periods from the cached pay period calendar: the past year through the next 20 weeks
+        calendar = get_calendar()
+        week_starts, default_index = calendar.window(pd.Timestamp.now(tz=eastern), past=PAST_PERIODS_SHOWN, future=10)
 
-        # Find the closest past week start (or today if it's a week start)
-        past_weeks = [w for w in week_starts if pd.to_datetime(w) <= current_date]
-        if past_weeks:
-            default_week = past_weeks[-1]  # Get the most recent past week
-            default_index = week_starts.index(default_week)
-        else:
-            default_index = 0
-
-        # Initialize selected_week in session state if not already set
-        if st.session_state.selected_week is None:
+        # Initialize selected_week in session state if not already set (or no longer offered)
+        if st.session_state.selected_week not in week_starts:
             st.session_state.selected_week = week_starts[default_index]
 
         # Add week selector
@@ -162,340 +196,372 @@ if check_password():
             st.session_state.selected_week = selected_week
 
         # Convert selected week to datetime and create full date range
-        week_start = pd.to_datetime(selected_week)
+        week_start = calendar.start_of_label(selected_week)
         week_end = week_start + pd.Timedelta(days=13)
         
-        # Show all users if Alan, otherwise just selected user
-        users_to_display = default_users if user == "Alan" else [user]
+        # Live mode: a shared snapshot listener keeps the cache current for this period
+        close_idle_listeners()
+        if supervisor and live_mode:
+            period = week_start.strftime('%Y-%m-%d')
+            listener = get_period_listener(db, record_cache, period)
+            listener.touch()
+            st.session_state.live_generation = listener.generation
+            watch_period(record_cache, period)
         
-        for current_user in users_to_display:
-            if user == "Alan":
-                st.subheader(f"Hours for {current_user}")
+        # Show all users to supervisors, otherwise just selected user
+        users_to_display = default_users if supervisor else [user]
+        
+        # Only the selected period is read: one document for an employee, one query for the supervisor
+        record_cache.ensure_period(users_to_display, week_start)
+        record_index = record_cache.index()
+        
+        # Without Firestore the cached/snapshot hours are still shown, but nothing can be changed
+        read_only = record_cache.offline
+        if read_only:
+            st.warning("The database cannot be reached. Showing the last saved copy of the hours; editing is disabled.")
+        
+        # Period, year-to-date and all-time totals for everyone shown, from the small aggregate documents
+        totals = {}
+        if not read_only:
+            try:
+                totals = load_totals(db, tuple(
+                    [period_doc_id(u, week_start) for u in users_to_display] +
+                    [year_totals_id(u, week_end.year) for u in users_to_display] +
+                    [user_totals_id(u) for u in users_to_display]
+                ))
+            except OFFLINE_ERRORS:
+                record_cache.mark_offline('totals')
+        # Latest save per user, falling back to this period's records if the totals predate LastUpdated
+        last_updated = {
+            u: pd.to_datetime(totals.get(user_totals_id(u), {}).get('LastUpdated') or record_index.user_last_updated(u))
+            for u in users_to_display
+        }
+        
+        # All displayed users' records for the period, reshaped once into a user x day x TimeType grid
+        week_start_tz = week_start.tz_localize('US/Eastern')
+        week_end_tz = week_end.tz_localize('US/Eastern')
+        with timed('filter'):
+            period_records = record_index.users_range(users_to_display, week_start_tz, week_end_tz)
+        with timed('pivot'):
+            period_days, grid = period_grid(period_records, users_to_display, week_start)
+        day_labels = period_days.strftime('%a %m/%d')
+        users_with_records = set(period_records['User'])
+        
+        if supervisor:
+            # Overview first: one row per employee, computed in one pass over the grid
+            with timed('summary'):
+                summary_df = period_summary(
+                    grid,
+                    period_records,
+                    {u: totals.get(year_totals_id(u, week_end.year), {}).get('Hours', {}) for u in users_to_display},
+                    last_updated
+                )
+            st.subheader(f"All employees for the week of {selected_week} - {week_end.strftime('%m/%d/%Y')}")
+            st.dataframe(
+                summary_df,
+                hide_index=True,
+                use_container_width=False,
+                column_config={
+                    col: st.column_config.NumberColumn(col, format="%.2f")
+                    for col in TIME_TYPES + ['Total', 'YTD Total']
+                }
+            )
             
-            # Filter for current user and date range
-            if not df.empty and 'Date' in df.columns:
-                # Convert week_start and week_end to timezone-aware timestamps
-                week_start_tz = pd.to_datetime(week_start).tz_localize('US/Eastern')
-                week_end_tz = pd.to_datetime(week_end).tz_localize('US/Eastern')
-                
-                user_df = df[
-                    (df['User'] == current_user) & 
-                    (df['Date'] >= week_start_tz) &
-                    (df['Date'] <= week_end_tz)
-                ]
-            else:
-                user_df = pd.DataFrame(columns=['User', 'Date', 'TimeType', 'Hours', 'LastUpdated', 'EnteredPayment'])
+            # Detail grids are only built for one page of employees at a time
+            page_count = max(-(-len(users_to_display) // DETAIL_PAGE_SIZE), 1)
+            detail_page = st.number_input(
+                "Detail page",
+                min_value=1,
+                max_value=page_count,
+                value=1,
+                key="detail_page"
+            ) if page_count > 1 else 1
+            detail_users = users_to_display[(detail_page - 1) * DETAIL_PAGE_SIZE:detail_page * DETAIL_PAGE_SIZE]
+        else:
+            detail_users = [user]
+        
+        for current_user in detail_users:
+            if supervisor:
+                st.subheader(f"Hours for {current_user}")
             
-            if user == "Alan" and user_df.empty:
+            if supervisor and current_user not in users_with_records:
                 st.info(f"No hours entered for {current_user}")
             
-            if not user_df.empty or user != "Alan":
-                # Create complete date range
-                date_df = pd.DataFrame({
-                    'Date': pd.date_range(
-                        start=week_start,
-                        end=week_end,
-                        freq='D'
-                    )
-                })
+            if current_user in users_with_records or not supervisor:
+                # This user's slice of the grid, with the dates formatted for display
+                display_df = grid.loc[current_user].reset_index(drop=True)
+                display_df.insert(0, 'Date', day_labels)
                 
-                # Make date_df timezone-aware to match user_df
-                date_df['Date'] = date_df['Date'].dt.tz_localize('US/Eastern')
-
-                # Pivot and prepare data
-                pivoted_df = user_df.pivot_table(
-                    index='Date',
-                    columns='TimeType',
-                    values='Hours',
-                    aggfunc='sum',
-                    fill_value=0
-                )
-                
-                # Merge with complete date range
-                pivoted_df = pd.merge(
-                    date_df,
-                    pivoted_df,
-                    left_on='Date',
-                    right_index=True,
-                    how='left'
-                ).fillna(0)
-                
-                # Ensure all required columns exist and replace None with 0
-                for col in ['Regular', 'Holiday', 'Sick', 'Vacation']:
-                    if col not in pivoted_df.columns:
-                        pivoted_df[col] = 0
-                    else:
-                        pivoted_df[col] = pivoted_df[col].replace({None: 0})
+                # Filter out zero rows for the supervisor view
+                if supervisor:
+                    display_df = display_df[(display_df[TIME_TYPES] != 0).any(axis=1)]
                 
-                # Format the dates and limit to 14 rows
-                display_df = pivoted_df.reset_index()
-                display_df['Date'] = display_df['Date'].dt.strftime('%a %m/%d')
-                display_df = display_df.head(14)  # Only take first 14 rows
-                
-                # Filter out zero rows for Alan's view
-                if user == "Alan":
-                    display_df = display_df[
-                        (display_df['Regular'] != 0) |
-                        (display_df['Holiday'] != 0) |
-                        (display_df['Sick'] != 0) |
-                        (display_df['Vacation'] != 0)
-                    ]
-                
-                if not display_df.empty or user != "Alan":
-                    edited_df = st.data_editor(
-                        data=display_df[["Date", "Regular", "Sick", "Vacation", "Holiday"]],
-                        hide_index=True,
-                        use_container_width=False,
-                        num_rows="fixed",
-                        height=min(38 + len(display_df) * 35, 600),
-                        column_config={
-                            "Date": st.column_config.TextColumn(
-                                "Date",
-                                width=75,
-                                disabled=True,
-                            ),
-                            "Regular": st.column_config.NumberColumn(
-                                "Regular",
-                                width=colwidth-10,
-                                min_value=0,
-                                max_value=24,
-                                step=0.25,
-                                format="%.2f"
-                            ),
-                            "Holiday": st.column_config.NumberColumn(
-                                "Holiday",
-                                width=colwidth-5,
-                                min_value=0,
-                                max_value=24,
-                                step=0.25,
-                                format="%.2f"
-                            ),
-                            "Sick": st.column_config.NumberColumn(
-                                "Sick",
-                                width=colwidth-25,
-                                min_value=0,
-                                max_value=24,
-                                step=0.25,
-                                format="%.2f"
-                            ),
-                            "Vacation": st.column_config.NumberColumn(
-                                "Vacation",
-                                width=colwidth-5,
-                                min_value=0,
-                                max_value=24,
-                                step=0.25,
-                                format="%.2f"
-                            )
-                        },
-                        key=f"timesheet_editor_{current_user}",
-                        disabled=user == "Alan"
-                    )
+                if not display_df.empty or not supervisor:
+                    # Remember which version of the period document editing started from
+                    doc_id = period_doc_id(current_user, week_start)
+                    editor_state = st.session_state.get(f"timesheet_editor_{current_user}")
+                    if doc_id not in st.session_state.base_versions or not (editor_state or {}).get('edited_rows'):
+                        st.session_state.base_versions[doc_id] = record_cache.version(doc_id)
+                    base_version = st.session_state.base_versions[doc_id]
+                    
+                    if not supervisor and st.session_state.save_message:
+                        level, message = st.session_state.save_message
+                        getattr(st, level)(message)
+                        st.session_state.save_message = None
                     
-                    if edited_df is not None and user != "Alan":
+                    with timed('render editor'):
+                        edited_df = st.data_editor(
+                            data=display_df[["Date", "Regular", "Sick", "Vacation", "Holiday"]],
+                            hide_index=True,
+                            use_container_width=False,
+                            num_rows="fixed",
+                            height=min(38 + len(display_df) * 35, 600),
+                            column_config={
+                                "Date": st.column_config.TextColumn(
+                                    "Date",
+                                    width=75,
+                                    disabled=True,
+                                ),
+                                "Regular": st.column_config.NumberColumn(
+                                    "Regular",
+                                    width=colwidth-10,
+                                    min_value=0,
+                                    max_value=24,
+                                    step=0.25,
+                                    format="%.2f"
+                                ),
+                                "Holiday": st.column_config.NumberColumn(
+                                    "Holiday",
+                                    width=colwidth-5,
+                                    min_value=0,
+                                    max_value=24,
+                                    step=0.25,
+                                    format="%.2f"
+                                ),
+                                "Sick": st.column_config.NumberColumn(
+                                    "Sick",
+                                    width=colwidth-25,
+                                    min_value=0,
+                                    max_value=24,
+                                    step=0.25,
+                                    format="%.2f"
+                                ),
+                                "Vacation": st.column_config.NumberColumn(
+                                    "Vacation",
+                                    width=colwidth-5,
+                                    min_value=0,
+                                    max_value=24,
+                                    step=0.25,
+                                    format="%.2f"
+                                )
+                            },
+                            key=f"timesheet_editor_{current_user}",
+                            disabled=supervisor or read_only
+                        )
+                    
+                    if edited_df is not None and not supervisor and not read_only:
                         if st.button("Save Changes", type="primary"):
-                            # Create records with timestamp
-                            records = []
                             current_timestamp = pd.Timestamp.now(tz=eastern).strftime('%Y-%m-%d %H:%M:%S')
                             
-                            for _, row in edited_df.iterrows():
-                                # Parse the date correctly using the year from selected_week
-                                date_str = row['Date'].split(' ')[1]  # Get '12/11' from 'Wed 12/11'
-                                month, day = date_str.split('/')
-                                selected_year = week_start.year  # Get year from the selected week
-                                full_date = f"{selected_year}-{month}-{day}"
-                                
-                                # Create a record for each non-zero value
-                                for time_type in ['Regular', 'Sick', 'Vacation', 'Holiday']:
-                                    hours = row[time_type]  # Get the value directly from the DataFrame
-                                    if hours > 0:  # Only add if hours are greater than 0
-                                        records.append({
-                                            'User': current_user,
-                                            'Date': full_date,
-                                            'TimeType': time_type,
-                                            'Hours': float(hours),  # Ensure it's a float
-                                            'LastUpdated': current_timestamp,
-                                            'EnteredPayment': ''  # Default to empty string for false
-                                        })
+                            # Map the displayed 'Wed 12/11' labels back to full dates (handles periods spanning New Year)
+                            full_dates = dict(zip(day_labels, period_days.strftime('%Y-%m-%d')))
                             
-                            # Get all existing data
-                            existing_docs = db.collection('sheet').stream()
-                            all_data = {}
-                            for doc in existing_docs:
-                                doc_data = doc.to_dict()
-                                if 'records' in doc_data:
-                                    user = doc.id
-                                    all_data[user] = doc_data['records']
-
-                            # Filter out records for current user and date range
-                            if current_user in all_data:
-                                filtered_data = [
-                                    record for record in all_data[current_user]
-                                    if not (
-                                        pd.to_datetime(record['Date']).tz_localize('US/Eastern') >= week_start.tz_localize('US/Eastern') and
-                                        pd.to_datetime(record['Date']).tz_localize('US/Eastern') <= week_end.tz_localize('US/Eastern')
-                                    )
-                                ]
-                            else:
-                                filtered_data = []
-
-                            # Add new records
-                            filtered_data.extend(records)
-
-                            # Update the document for current user
-                            db.collection('sheet').document(current_user).set({
-                                'records': filtered_data
-                            })
-
-                            # Reload the data
+                            # Only the cells that differ from what was rendered get written
+                            changes = diff_period(current_user, display_df, edited_df, full_dates, current_timestamp)
+                            if not changes:
+                                st.session_state.save_message = ('info', "No changes to save")
+                                st.rerun()
+                            
+                            # Shown in the cache at once; written (and confirmed or rejected) in the background
+                            st.session_state.base_versions[doc_id] = save_queue.submit(
+                                st.session_state.session_key, current_user, week_start, changes, base_version
+                            )
+                            st.session_state.save_message = ('info', "Saving changes...")
                             st.rerun()
                     
                     # Add caption and calculate sums
                     st.subheader(f"Bi-weekly Totals for the week of {selected_week} - {week_end.strftime('%m/%d/%Y')}")
+                    # Fall back to summing the grid if this period's totals were never materialized
+                    period_hours = totals.get(period_doc_id(current_user, week_start), {}).get('Hours')
+                    if period_hours is None:
+                        period_hours = {col: display_df[col].sum() for col in TIME_TYPES}
+                    ytd_hours = totals.get(year_totals_id(current_user, week_end.year), {}).get('Hours', {})
                     sums_df = pd.DataFrame({
-                        'Date': ['Totals'],
-                        'Regular': [display_df['Regular'].sum()],
-                        'Sick': [display_df['Sick'].sum()],
-                        'Vacation': [display_df['Vacation'].sum()],
-                        'Holiday': [display_df['Holiday'].sum()]
+                        'Date': ['Totals', f"YTD {week_end.year}"],
+                        'Regular': [period_hours.get('Regular', 0), ytd_hours.get('Regular', 0)],
+                        'Sick': [period_hours.get('Sick', 0), ytd_hours.get('Sick', 0)],
+                        'Vacation': [period_hours.get('Vacation', 0), ytd_hours.get('Vacation', 0)],
+                        'Holiday': [period_hours.get('Holiday', 0), ytd_hours.get('Holiday', 0)]
                     })
                     
                     # Display sums
-                    st.data_editor(
-                        data=sums_df,
-                        hide_index=True,
-                        use_container_width=False,
-                        num_rows="fixed",
-                        column_config={
-                            "Date": st.column_config.TextColumn(
-                                "Date",
-                                width=75,
-                                disabled=True,
-                            ),
-                            "Regular": st.column_config.NumberColumn(
-                                "Regular",
-                                width=colwidth-10,
-                                disabled=True,
-                                format="%.2f"
-                            ),
-                            "Holiday": st.column_config.NumberColumn(
-                                "Holiday",
-                                width=colwidth-5,
-                                disabled=True,
-                                format="%.2f"
-                            ),
-                            "Sick": st.column_config.NumberColumn(
-                                "Sick",
-                                width=colwidth-25,
-                                disabled=True,
-                                format="%.2f"
-                            ),
-                            "Vacation": st.column_config.NumberColumn(
-                                "Vacation",
-                                width=colwidth-5,
-                                disabled=True,
-                                format="%.2f"
-                            )
-                        },
-                        key=f"sums_editor_{current_user}"
-                    )
+                    with timed('render totals'):
+                        st.data_editor(
+                            data=sums_df,
+                            hide_index=True,
+                            use_container_width=False,
+                            num_rows="fixed",
+                            column_config={
+                                "Date": st.column_config.TextColumn(
+                                    "Date",
+                                    width=75,
+                                    disabled=True,
+                                ),
+                                "Regular": st.column_config.NumberColumn(
+                                    "Regular",
+                                    width=colwidth-10,
+                                    disabled=True,
+                                    format="%.2f"
+                                ),
+                                "Holiday": st.column_config.NumberColumn(
+                                    "Holiday",
+                                    width=colwidth-5,
+                                    disabled=True,
+                                    format="%.2f"
+                                ),
+                                "Sick": st.column_config.NumberColumn(
+                                    "Sick",
+                                    width=colwidth-25,
+                                    disabled=True,
+                                    format="%.2f"
+                                ),
+                                "Vacation": st.column_config.NumberColumn(
+                                    "Vacation",
+                                    width=colwidth-5,
+                                    disabled=True,
+                                    format="%.2f"
+                                )
+                            },
+                            key=f"sums_editor_{current_user}"
+                        )
                     
                     # Display last updated time
-                    if not df.empty and 'LastUpdated' in df.columns:
-                        last_updated = df[
-                            (df['User'] == current_user)
-                        ]['LastUpdated'].max()
-                        if pd.notna(last_updated) and last_updated is not None:
-                            try:
-                                formatted_time = pd.to_datetime(last_updated, format='%Y-%m-%d %H:%M:%S').strftime('%B %d, %Y at %I:%M %p')
-                                st.info(f"Last updated: {formatted_time}")
-                            except:
-                                st.info("No previous updates")
-                        else:
-                            st.info("No previous updates")
+                    user_last_updated = last_updated.get(current_user)
+                    if user_last_updated is not None and pd.notna(user_last_updated):
+                        st.info(f"Last updated: {user_last_updated.strftime('%B %d, %Y at %I:%M %p')}")
                     else:
                         st.info("No previous updates")
+                    
+                    # Edit history for this period (one document read, only when asked for)
+                    if not read_only and st.toggle("Show edit history", key=f"history_{current_user}"):
+                        history = load_period_history(db, current_user, week_start)
+                        if not history:
+                            st.caption("No edits recorded for this period")
+                        else:
+                            st.dataframe(
+                                history_frame(history),
+                                hide_index=True,
+                                use_container_width=False,
+                                column_config={
+                                    col: st.column_config.NumberColumn(col, format="%.2f") for col in ['Before', 'After']
+                                }
+                            )
+                            versions = [entry['Version'] for entry in history]
+                            as_of = st.select_slider(
+                                "Hours as of save",
+                                options=versions,
+                                value=versions[-1],
+                                key=f"history_version_{current_user}"
+                            ) if len(versions) > 1 else versions[0]
+                            st.dataframe(
+                                replay_period(period_records[period_records['User'] == current_user], history, as_of),
+                                hide_index=True,
+                                use_container_width=False
+                            )
 
-        # Add "Entered for Payment" button at the very bottom of the page for Alan's view
-        if user == "Alan":
+        # Add "Entered for Payment" button at the very bottom of the page for the supervisor view
+        if supervisor and not read_only:
             st.markdown("---")  # Add a visual separator
             
-            # Check if all displayed rows are already entered for payment
-            current_period_data = [
-                row for row in docs.to_dict() 
-                if (
-                    row['User'] in users_to_display and
-                    pd.to_datetime(row['Date']).tz_localize('UTC') >= pd.to_datetime(week_start).tz_localize('UTC') and
-                    pd.to_datetime(row['Date']).tz_localize('UTC') <= pd.to_datetime(week_end).tz_localize('UTC') and
-                    float(row.get('Hours', 0)) > 0
-                )
-            ]
+            # All records in the selected period for the displayed users, from the pre-parsed cache
+            current_period_data = period_records[period_records['Hours'] > 0]
             
-            # Check if any row in the period has EnteredPayment
-            payment_entered = any(
-                row.get('EnteredPayment', '') != '' 
-                for row in current_period_data
-            ) if current_period_data else False
+            # Check if any row in the period has EnteredPayment (NaT when not entered)
+            payment_stamps = current_period_data['EnteredPayment']
+            payment_entered = payment_stamps.notna().any()
             
             if payment_entered:
-                try:
-                    # Get the latest payment timestamp from all rows in current period
-                    payment_times = [pd.to_datetime(row.get('EnteredPayment')) 
-                                   for row in current_period_data 
-                                   if pd.notna(pd.to_datetime(row.get('EnteredPayment', '')))]
-                    if payment_times:
-                        latest_payment = max(payment_times)
-                        formatted_time = latest_payment.strftime('%B %d, %Y at %I:%M %p')
-                        st.success(f"All hours in this period have been entered for payment on {formatted_time}")
-                    else:
-                        st.success("All hours in this period have been entered for payment")
-                except (ValueError, AttributeError, KeyError):
+                # Get the latest payment timestamp from all rows in current period
+                latest_payment = payment_stamps.max()
+                if pd.notna(latest_payment):
+                    formatted_time = latest_payment.strftime('%B %d, %Y at %I:%M %p')
+                    st.success(f"All hours in this period have been entered for payment on {formatted_time}")
+                else:
                     st.success("All hours in this period have been entered for payment")
             elif st.button("Enter for Payment", type="primary", key="payment_button"):
-                # Get all existing data
-                all_data = docs.to_dict()
-                
-                # Update EnteredPayment to datetime for matching rows
-                updated_data = []
+                # Mark every record in the period for all displayed users in one transaction
                 payment_timestamp = pd.Timestamp.now(tz=eastern).strftime('%Y-%m-%d %H:%M:%S')
-                for row in all_data:
-                    if (
-                        row['User'] in users_to_display and
-                        pd.to_datetime(row['Date']).tz_localize('UTC') >= pd.to_datetime(week_start).tz_localize('UTC') and
-                        pd.to_datetime(row['Date']).tz_localize('UTC') <= pd.to_datetime(week_end).tz_localize('UTC')
-                    ):
-                        row['EnteredPayment'] = payment_timestamp
-                    updated_data.append(row)
-                
-                # Clear and update sheet
-                db.collection('sheet').document(user).set(updated_data)
-                
-                formatted_time = pd.to_datetime(payment_timestamp).strftime('%B %d, %Y at %I:%M %p')
-                st.success(f"Payment entry recorded for all users in selected period on {formatted_time}")
+                set_payment_status(db, current_period_data, payment_timestamp)
+                record_cache.invalidate_period(week_start)
+                st.rerun()
 
-                 # Add "Reset Week" button
+            # Add "Reset Week" button
             if st.button("Reset Week", type="secondary", key="reset_week_button"):
-                # Get all existing data
-                all_data = docs.to_dict()
-                
-                # Update EnteredPayment to empty for matching rows
-                updated_data = []
-                # st.write(all_data)
-                for row in all_data:
-                    # st.write(row)
-                    if (
-                        row['User'] in users_to_display and
-                        pd.to_datetime(row['Date']).tz_localize('UTC') >= pd.to_datetime(week_start).tz_localize('UTC') and
-                        pd.to_datetime(row['Date']).tz_localize('UTC') <= pd.to_datetime(week_end).tz_localize('UTC') and
-                        float(row.get('Hours', 0)) > 0
-                    ):
-                    
-                        row['EnteredPayment'] = ''  # Reset the EnteredPayment field
-                    updated_data.append(row)
-                
-                # Clear and update sheet
-                db.collection('sheet').document(user).set(updated_data)
-                
-                # st.success("Payment entries have been reset for the selected period.")
+                # Clear EnteredPayment on the same records, again in one transaction
+                set_payment_status(db, current_period_data, '')
+                record_cache.invalidate_period(week_start)
                 st.rerun()
+
+            # Multi-period payroll report with CSV/Parquet export
+            with st.expander("Payroll report"):
+                report_start, report_end = st.columns(2)
+                report_start = report_start.date_input(
+                    "From", value=pd.Timestamp.now(tz=eastern).replace(month=1, day=1).date(), key="report_start"
+                )
+                report_end = report_end.date_input(
+                    "To", value=pd.Timestamp.now(tz=eastern).date(), key="report_end"
+                )
+                if st.button("Build report", key="report_button"):
+                    report = build_report(db, report_start, report_end)
+                    st.dataframe(report, use_container_width=False)
+                    file_name = f"hours_{report_start:%Y%m%d}_{report_end:%Y%m%d}"
+                    st.download_button(
+                        "Download CSV",
+                        data=report_bytes(report, 'csv'),
+                        file_name=f"{file_name}.csv",
+                        mime="text/csv",
+                        key="report_csv"
+                    )
+                    try:
+                        st.download_button(
+                            "Download Parquet",
+                            data=report_bytes(report, 'parquet'),
+                            file_name=f"{file_name}.parquet",
+                            mime="application/octet-stream",
+                            key="report_parquet"
+                        )
+                    except ImportError:
+                        st.caption("Parquet export needs pyarrow installed on the server.")
+
+            # Add staff or change roles without a redeploy
+            with st.expander("Staff"):
+                st.dataframe(pd.DataFrame(directory), hide_index=True, use_container_width=False)
+                with st.form("staff_form", clear_on_submit=True):
+                    staff_name = st.text_input("Name")
+                    staff_role = st.selectbox("Role", options=ROLES)
+                    staff_active = st.checkbox("Active", value=True)
+                    if st.form_submit_button("Add or update") and staff_name.strip():
+                        problem = name_problem(staff_name.strip())
+                        if problem:
+                            st.error(problem)
+                        else:
+                            save_user(db, staff_name.strip(), staff_role, staff_active)
+                            st.rerun()
     else:
-        st.write("Please select a user")
\ No newline at end of file
+        st.write("Please select a user")
+
+    # Admin-only debug panel with this run's timings and Firestore traffic
+    run_summary = finish_run()
+    if supervisor:
+        with debug_panel.container():
+            with st.expander("Debug metrics"):
+                st.caption(f"Script run: {run_summary['total_ms']:.0f} ms")
+                st.dataframe(
+                    pd.DataFrame({
+                        'ms': run_summary['timings_ms'],
+                        'calls': run_summary['calls'],
+                    }),
+                    use_container_width=True
+                )
+                st.write("This run:", run_summary['counters'] or "no Firestore traffic")
+                st.write("Since process start:", dict(process_totals))
\ No newline at end of file
@@ -0,0 +1,79 @@
+import streamlit as st
+
+from data_store import PROBE_RETRY, PROBE_TIMEOUT
+from instrumentation import count_reads, count_writes, timed
+
+# One document per person, e.g. users/Stacey: {'Name': 'Stacey', 'Role': 'employee', 'Active': True, 'Order': 0}
+USERS_COLLECTION = 'users'
+ROLES = ['employee', 'supervisor']
+# Staff changes show up within this many seconds without a redeploy
+DIRECTORY_TTL = 300
+
+# Used until the `users` collection has been populated, and written as its first entries
+DEFAULT_DIRECTORY = [
+    {'Name': 'Stacey', 'Role': 'employee', 'Active': True, 'Order': 0},
+    {'Name': 'Aaron', 'Role': 'employee', 'Active': True, 'Order': 1},
+    {'Name': 'Daisy', 'Role': 'employee', 'Active': True, 'Order': 2},
+    {'Name': 'Cindy', 'Role': 'employee', 'Active': True, 'Order': 3},
+    {'Name': 'Alan', 'Role': 'supervisor', 'Active': True, 'Order': 4},
+]
+
+
+@st.cache_data(ttl=DIRECTORY_TTL)
+def load_directory(_db):
+    """Everyone in the `users` collection, in display order."""
+    with timed('load directory'):
+        snapshots = _db.collection(USERS_COLLECTION).stream(retry=PROBE_RETRY, timeout=PROBE_TIMEOUT)
+        entries = [snapshot.to_dict() or {} for snapshot in snapshots]
+        count_reads(len(entries))
+    entries = [entry for entry in entries if entry.get('Name')]
+    if not entries:
+        return [dict(entry) for entry in DEFAULT_DIRECTORY]
+    return sorted(entries, key=lambda entry: (entry.get('Order', len(entries)), entry['Name']))
+
+
+def active_users(directory):
+    """Names of active people, in display order."""
+    return [entry['Name'] for entry in directory if entry.get('Active', True)]
+
+
+def is_supervisor(directory, name):
+    """True if `name` has the supervisor role."""
+    return any(entry['Name'] == name and entry.get('Role') == 'supervisor' for entry in directory)
+
+
+def name_problem(name):
+    """Why `name` cannot be used, or None; names become part of Firestore document ids."""
+    if '/' in name:
+        return "Names cannot contain '/'."
+    if name in ('.', '..') or (name.startswith('__') and name.endswith('__')):
+        return f"'{name}' is reserved by the database; choose another name."
+    if len(name.encode('utf-8')) > 100:
+        return "Names can be at most 100 bytes long."
+    return None
+
+
+def save_user(db, name, role, active):
+    """Adds or updates one person, seeding the collection with the defaults the first time.
+
+    Raises ValueError if `name` cannot be used (see name_problem).
+    """
+    problem = name_problem(name)
+    if problem:
+        raise ValueError(problem)
+    collection = db.collection(USERS_COLLECTION)
+    directory = load_directory(db)
+    batch = db.batch()
+    writes = 0
+    seeded = list(collection.limit(1).stream())
+    count_reads(1)
+    if not seeded:
+        for entry in directory:
+            batch.set(collection.document(entry['Name']), entry)
+            writes += 1
+    existing = next((entry for entry in directory if entry['Name'] == name), None)
+    order = existing.get('Order', len(directory)) if existing else len(directory)
+    batch.set(collection.document(name), {'Name': name, 'Role': role, 'Active': active, 'Order': order}, merge=True)
+    batch.commit()
+    count_writes(writes + 1)
+    load_directory.clear()
@@ -0,0 +1,128 @@
+import threading
+import time
+
+import streamlit as st
+
+from data_store import OFFLINE_ERRORS, SaveConflict, load_totals, period_doc_id, save_period_changes
+from instrumentation import finish_run, start_run
+from pay_periods import period_start
+
+# How long (seconds) a queued save waits for more edits to the same period before it is written
+COALESCE_SECONDS = 0.5
+
+
+class SaveQueue:
+    """Writes period saves on a background thread so the page never waits on Firestore.
+
+    submit() applies the changes to the RecordCache right away and returns; the worker then
+    commits them with save_period_changes(). A session's save that builds on its own save still
+    waiting in the queue is merged into that write; any other save is queued after it and
+    checks its own base version, so a stale edit still ends in a conflict. Each session collects the outcome
+    of its saves with results(). Every write is its own metrics run on the worker thread,
+    logged like a script run when TTA_METRICS_LOG is set.
+    """
+
+    def __init__(self, db, record_cache):
+        self.db = db
+        self.record_cache = record_cache
+        self.condition = threading.Condition()
+        self.pending = []  # queued saves, oldest first; a session's later edits merge into its own
+        self.writing = None  # the queued save the worker is committing right now
+        self.outcomes = {}  # session key -> [(doc id, status, detail)]
+        self.worker = threading.Thread(target=self._run, name='save-queue', daemon=True)
+        self.worker.start()
+
+    def submit(self, session, user, start, changes, base_version):
+        """Queues `changes` (see diff_period) to `user`'s period.
+
+        Returns the Version the document will have once the queued write lands, which is what
+        the session should edit from next.
+        """
+        start = period_start(start)
+        doc_id = period_doc_id(user, start)
+        with self.condition:
+            queued = next((save for save in reversed(self.pending) if save['doc_id'] == doc_id), None)
+            if queued is not None and queued['session'] == session and base_version == queued['base_version'] + 1:
+                # Edited from what the queued save will write: later edits win cell by cell
+                queued['changes'].update(changes)
+                version = base_version
+            else:
+                self.pending.append({
+                    'doc_id': doc_id,
+                    'user': user,
+                    'start': start,
+                    'changes': dict(changes),
+                    'base_version': base_version,
+                    'session': session,
+                    'queued_at': time.monotonic(),
+                })
+                version = base_version + 1
+            self.record_cache.apply_changes(doc_id, changes, version)
+            self.condition.notify()
+        return version
+
+    def busy(self, session):
+        """True while any save submitted by `session` has not been reported yet."""
+        with self.condition:
+            queued = self.pending + ([self.writing] if self.writing else [])
+            return session in self.outcomes or any(save['session'] == session for save in queued)
+
+    def results(self, session):
+        """Returns and forgets the finished saves of `session`: [(doc id, 'saved'|'conflict'|'error', detail)].
+
+        The detail is the document's current Version for a conflict and the message for an error.
+        """
+        with self.condition:
+            return self.outcomes.pop(session, [])
+
+    def _next(self):
+        # Oldest queued save once its coalescing window has passed, or how long to wait for it
+        if not self.pending:
+            return None, None
+        wait = self.pending[0]['queued_at'] + COALESCE_SECONDS - time.monotonic()
+        if wait > 0:
+            return None, wait
+        return self.pending.pop(0), None
+
+    def _run(self):
+        while True:
+            with self.condition:
+                queued, wait = self._next()
+                while queued is None:
+                    self.condition.wait(wait)
+                    queued, wait = self._next()
+                self.writing = queued
+                doc_id = queued['doc_id']
+            outcome = ('error', "The save was interrupted")
+            start_run(f"save-queue {doc_id}")
+            try:
+                try:
+                    save_period_changes(self.db, queued['user'], queued['start'], queued['changes'], queued['base_version'])
+                    outcome = ('saved', None)
+                except SaveConflict as conflict:
+                    outcome = ('conflict', conflict.version)
+                except OFFLINE_ERRORS as error:
+                    self.record_cache.offline = True
+                    outcome = ('error', f"the database cannot be reached ({error})")
+                except Exception as error:  # Report anything else to the session rather than losing it silently
+                    outcome = ('error', str(error))
+                try:
+                    # Replace the optimistic copy with what is actually stored
+                    self.record_cache.invalidate(doc_id)
+                    load_totals.clear()
+                except OFFLINE_ERRORS:
+                    self.record_cache.offline = True
+                    if outcome[0] != 'saved':
+                        self.record_cache.revert(doc_id)
+            finally:
+                # Always report, so the session stops waiting and the worker moves on to the next save
+                finish_run()
+                with self.condition:
+                    self.writing = None
+                    self.outcomes.setdefault(queued['session'], []).append((doc_id, *outcome))
+
+
+@st.cache_resource
+def get_save_queue(_db, _record_cache):
+    """The process's SaveQueue for the process's RecordCache (see get_record_cache), shared by every session."""
+    return SaveQueue(_db, _record_cache)